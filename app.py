@@ -12,18 +12,57 @@ from docutils.nodes import author
 from streamlit_scroll_navigation import scroll_navbar
 from datetime import date, timedelta, datetime
 import logging
+import math
 import os
+import re
 import pandas as pd
+from authoring import (
+    archive_bundles,
+    ingest_bundles,
+    load_bundle,
+    pending_bundles,
+    validate_bundles,
+)
 from auth import (
     create_account,
     verify_password,
     send_reset_email,
-    load_users,
+    find_user_by_email,
     verify_reset_code,
-    hash_password,
-    save_users,
-    download_json
+    update_password,
+)
+from db import (
+    get_cursor,
+    get_writer,
+    get_leaderboard,
+    get_session_tokens,
+    get_themes,
+    get_authors,
+    get_difficulties,
+    get_catalog_snapshot,
+    get_sequencer,
+    get_query_executor,
+    get_tables_fingerprint,
+    get_table_summary,
+    get_table_page,
+    invalidate_content,
 )
+from solutions import get_solution, parse_tables
+from compare import compare_results
+from dao import get_answer
+from reviews import apply_reviews, get_due_dates, reset_reviews
+from scores import exercise_points, record_attempt
+from scheduler import REVIEW_GRADES
+from executor import QueryTimeout, ResultTooLarge
+from memo import clear_memo, memoize
+from sequencer import StoryStrategy
+from sessions import SESSION_PARAM, save_revocation
+from startup import start_background_sync, wait_for_database
+from tracing import reset as reset_spans, span, summary, traced
+
+TABLE_PAGE_SIZE = 50
+# Modes de la barre latérale : libellé -> stratégie de sequencer.py.
+MODES = {"Révisions": "srs", "Au hasard": "random", "Histoire": "story"}
 
 
 def login_page():
@@ -37,6 +76,9 @@ def login_page():
             st.success("Bienvenue, vous êtes connecté !")
             st.session_state["username"] = username
             st.session_state["authenticated"] = True
+            # Jeton signé dans l'URL : un rafraîchissement ou une reconnexion
+            # rouvre la session sans repasser par le mot de passe.
+            st.query_params[SESSION_PARAM] = get_session_tokens().issue(username)
             st.rerun()
         else:
             st.error("Nom d'utilisateur ou mot de passe incorrect.")
@@ -50,11 +92,12 @@ def create_account_page():
     email = st.text_input("Email")
 
     if st.button("Créer le compte"):
-        if create_account(username, password, email):
+        created = create_account(username, password, email)
+        if created:
             st.success(
                 "Compte créé avec succès ! Vous pouvez maintenant vous connecter."
             )
-        else:
+        elif created is False:
             st.error("Un compte avec ce nom d'utilisateur existe déjà.")
 
 
@@ -78,16 +121,13 @@ def forgot_password_page():
 def reinit_code_validation():
     reset_code = st.text_input("Entrez le code de réinitialisation envoyé par email")
     if st.button("Valider le code"):
-        users = load_users()
-        username = None
-        for user, data in users.items():
-            if data["email"] == st.session_state.reset_email:
-                username = user
-                break
+        username = find_user_by_email(st.session_state.reset_email)
 
         if username and verify_reset_code(username, reset_code):
             st.session_state.reset_step = "new_password"
-            st.success("Code validé avec succès. Veuillez entrer un nouveau mot de passe.")
+            st.success(
+                "Code validé avec succès. Veuillez entrer un nouveau mot de passe."
+            )
             st.rerun()
         else:
             st.error("Code de réinitialisation invalide.")
@@ -112,49 +152,66 @@ def reinit_password():
 def send_reinit_mail():
     email = st.text_input("Entrez votre email")
     if st.button("Envoyer un code de réinitialisation"):
-        users = load_users()
-        user_found = False
-
-        for username, user_data in users.items():
-            if user_data["email"] == email:
-                send_reset_email(email, username)
-                user_found = True
-                st.session_state.reset_email = email
-                st.session_state.reset_step = "code"
-                st.success(f"Un code de réinitialisation a été envoyé à {email}.")
-                st.rerun()
-                break
-
-        if not user_found:
+        username = find_user_by_email(email)
+
+        if username is not None:
+            if not send_reset_email(email, username):
+                return
+            st.session_state.reset_email = email
+            st.session_state.reset_step = "code"
+            st.success(f"Un code de réinitialisation a été envoyé à {email}.")
+            st.rerun()
+        else:
             st.error("Aucun utilisateur trouvé avec cet email.")
 
 
 def reset_user_password(email, new_password):
-    users = load_users()
-    for username, user_data in users.items():
-        if user_data["email"] == email:
-            hashed_password = hash_password(new_password)
-            users[username]["password"] = hashed_password
-            save_users(users)
-            return True
-    return False
+    username = find_user_by_email(email)
+    if username is None:
+        return False
+    if not update_password(username, new_password):
+        return False
+    # Les sessions ouvertes avec l'ancien mot de passe sont fermées.
+    revocation = get_session_tokens().revoke_user(username)
+    get_writer().execute(save_revocation, *revocation)
+    return True
+
+
+@traced("app.restore_session")
+def restore_session():
+    """Rouvre la session depuis le jeton de l'URL, sans accès aux utilisateurs."""
+    token = st.query_params.get(SESSION_PARAM)
+    if token is None:
+        return
+    username = get_session_tokens().verify(token)
+    if username is None:
+        del st.query_params[SESSION_PARAM]
+        return
+    st.session_state["username"] = username
+    st.session_state["authenticated"] = True
 
 
-def initialize_environment():
-    if "data" not in os.listdir():
-        logging.error(os.listdir())
-        logging.error("Creating folder: data")
-        os.mkdir("data")
+def logout():
+    token = st.query_params.get(SESSION_PARAM)
+    if token is not None:
+        revocation = get_session_tokens().revoke(token)
+        if revocation is not None:
+            get_writer().execute(save_revocation, *revocation)
+        del st.query_params[SESSION_PARAM]
+    st.session_state["authenticated"] = False
+    st.session_state["username"] = None
+    clear_memo()
 
-    if "exercises_sql_tables.duckdb" not in os.listdir("data"):
-        exec(open("init_db.py").read())
 
-    return duckdb.connect(database="data/exercises_sql_tables.duckdb", read_only=False)
+@traced("app.initialize_environment")
+def initialize_environment():
+    wait_for_database()
+    return get_cursor()
 
 
-def get_theme(con):
-    themes = con.execute("SELECT DISTINCT theme FROM memory_state").fetchdf()
-    theme_list = themes["theme"].unique().tolist()
+def get_theme():
+    theme_list = get_themes()
+    counts = get_catalog_snapshot().counts("theme")
 
     default_theme = theme_list[0] if theme_list else None
 
@@ -165,42 +222,80 @@ def get_theme(con):
         theme_list,
         index=default_index,
         placeholder="Sélectionnez un thème..." if theme_list else None,
+        format_func=lambda value: f"{value} ({counts.get(value, 0)})",
     )
     return theme
 
-def get_author(con):
-    authors = con.execute("SELECT DISTINCT author FROM memory_state").fetchdf()
-    author_list = authors["author"].unique().tolist()
+
+def get_author(theme):
+    author_list = get_authors()
+    counts = get_catalog_snapshot().counts("author", theme=theme)
 
     default_theme = author_list[0] if author_list else None
 
     default_index = author_list.index(default_theme) if default_theme else 0
 
-
     author = st.sidebar.selectbox(
         "Auteur de l'exercice :",
-        authors["author"].unique(),
+        author_list,
         index=default_index,
         placeholder="Sélectionnez un thème...",
+        format_func=lambda value: f"{value} ({counts.get(value, 0)})",
     )
     return author
 
-def get_difficulty(con):
-    difficulties = con.execute("SELECT DISTINCT difficulty FROM memory_state").fetchdf()
-    options = difficulties["difficulty"].astype(str).tolist()
-    fixed_order = ['easy', 'medium', 'hard']
+
+def get_difficulty(theme, author):
+    options = get_difficulties()
+    counts = {
+        str(value): count
+        for value, count in get_catalog_snapshot()
+        .counts("difficulty", theme=theme, author=author)
+        .items()
+    }
+    fixed_order = ["easy", "medium", "hard"]
     options = [opt for opt in fixed_order if opt in options]
     difficulty = st.sidebar.select_slider(
-        'Choisissez un niveau de difficulté :',
+        "Choisissez un niveau de difficulté :",
         options=options,
-        value=options[0] if options else 'medium'
+        value=options[0] if options else "medium",
+        format_func=lambda value: f"{value} ({counts.get(value, 0)})",
     )
     return difficulty
 
 
-def check_users_solution(con, user_query, solution_df):
+def is_ordered_query(query):
+    """Vrai si le résultat final est trié : ORDER BY hors de toute parenthèse.
+
+    Chaînes et commentaires sont retirés, puis les groupes entre parenthèses
+    (OVER, string_agg, sous-requêtes, CTE) du plus interne au plus externe.
+    """
+    query = re.sub(
+        r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/",
+        " ",
+        query,
+        flags=re.DOTALL,
+    )
+    previous = None
+    while query != previous:
+        previous = query
+        query = re.sub(r"\([^()]*\)", " ", query)
+    return re.search(r"\border\s+by\b", query, re.IGNORECASE) is not None
+
+
+def check_users_solution(user_query, solution_df, ordered=True):
+    """True ou False si la réponse a été comparée à la solution, sinon None
+    (requête en erreur, trop longue, ou solution indisponible)."""
+    if solution_df is None:
+        st.error("La solution de cet exercice est indisponible.")
+        return None
     try:
-        result = con.execute(user_query).df()
+        executor = get_query_executor()
+        # Une réponse juste a autant de lignes que la solution, même au-delà
+        # de la limite par défaut.
+        max_rows = max(executor.max_rows, len(solution_df) + 1)
+        with span("query.user"):
+            result = executor.execute(user_query, max_rows=max_rows)
         text = ("Votre réponse :", "Solution :")
 
         cols = st.columns(2)
@@ -212,56 +307,113 @@ def check_users_solution(con, user_query, solution_df):
             st.write(f"**{text[1]}**")
             st.dataframe(solution_df, hide_index=True)
 
-        if result.shape[0] != solution_df.shape[0]:
-            st.write("Le nombre de lignes est incorrect")
-
-        elif result.shape[1] != solution_df.shape[1]:
-            st.write("Le nombre de colonnes est incorrect")
+        with span("compare.results", rows=len(result)):
+            comparison = compare_results(result, solution_df, ordered=ordered)
 
-        elif not result.compare(solution_df).empty:
-            st.write("Le contenu est incorrect")
+        if not comparison.equal:
+            st.write(comparison.reason)
+            if comparison.result_rows:
+                st.write("Lignes en écart dans votre réponse :")
+                st.dataframe(result.iloc[comparison.result_rows], hide_index=True)
 
         else:
             st.write("Bravo, réponse correcte !")
             st.balloons()
+        return comparison.equal
 
     except (AttributeError, duckdb.ParserException) as e:
         st.write(
             "Il y a une erreur dans la syntaxe de votre requête. Veuillez réessayer."
         )
 
+    except (QueryTimeout, ResultTooLarge) as e:
+        st.write(str(e))
 
-def schedule_review(con, exercise_name):
-    col1, col2, col3, col4 = st.columns(4)
+    except duckdb.Error as e:
+        st.write(f"Erreur lors de l'exécution de votre requête : {e}")
+    return None
+
+
+def record_answer(exercise_name, correct, points):
+    username = st.session_state["username"]
+    with span("query.record_attempt"):
+        score = get_writer().execute(
+            record_attempt, username, exercise_name, correct, points
+        )
+    get_leaderboard().update(username, score["points"], score["solved"])
+
+
+def display_leaderboard():
+    username = st.session_state["username"]
+    leaderboard = get_leaderboard()
+    with st.sidebar.expander("Classement"):
+        top = leaderboard.top(10)
+        if not top:
+            st.write("Aucun point marqué pour l'instant.")
+        else:
+            st.dataframe(
+                pd.DataFrame(top, columns=["utilisateur", "points", "réussis"]),
+                hide_index=True,
+            )
+        rank = leaderboard.rank(username)
+        if rank is not None:
+            st.caption(f"Votre rang : {rank}")
+
+
+def bump_reviews_version():
+    # Les révisions de l'utilisateur ont changé : voir main_app.
+    st.session_state["reviews_version"] = st.session_state.get("reviews_version", 0) + 1
+
+
+def schedule_review(exercise_name, story=None):
+    # story : (thème, auteur) du parcours en mode histoire, sinon None.
+    username = st.session_state["username"]
+    cols = st.columns(len(REVIEW_GRADES) + 1)
     if exercise_name != "all":
-        with col1:
-            if st.button("Revoir dans 2 jours"):
-                next_review = date.today() + timedelta(days=2)
-                con.execute(
-                    f"UPDATE memory_state SET last_reviewed = '{next_review}' WHERE exercise_name = '{exercise_name}'"
-                )
-                st.rerun()
-        with col2:
-            if st.button("Revoir dans 7 jours"):
-                next_review = date.today() + timedelta(days=7)
-                con.execute(
-                    f"UPDATE memory_state SET last_reviewed = '{next_review}' WHERE exercise_name = '{exercise_name}'"
-                )
-                st.rerun()
-        with col3:
-            if st.button("Revoir dans 21 jours"):
-                next_review = date.today() + timedelta(days=21)
-                con.execute(
-                    f"UPDATE memory_state SET last_reviewed = '{next_review}' WHERE exercise_name = '{exercise_name}'"
-                )
-                st.rerun()
-    with col4:
+        for col, (label, quality) in zip(cols, REVIEW_GRADES.items()):
+            with col:
+                if st.button(label):
+                    with span("query.record_review"):
+                        get_writer().execute(
+                            apply_reviews, username, {exercise_name: quality}
+                        )
+                    if story is not None and quality >= 3:
+                        StoryStrategy.advance(st.session_state, *story)
+                    bump_reviews_version()
+                    st.rerun()
+    with cols[-1]:
         if st.button("Réinitialiser toutes les dates"):
-            con.execute("UPDATE memory_state SET last_reviewed = '1970-01-01'")
+            get_writer().execute(reset_reviews, username)
+            if story is not None:
+                StoryStrategy.restart(st.session_state, *story)
+            bump_reviews_version()
             st.rerun()
 
 
-def display_tables(con, exercise):
+def display_table_preview(table):
+    with span("query.table_summary"):
+        row_count, columns = get_table_summary(table)
+    pages = max(1, math.ceil(row_count / TABLE_PAGE_SIZE))
+
+    st.caption(
+        f"{row_count} lignes · "
+        + ", ".join(f"{name} ({data_type})" for name, data_type in columns)
+    )
+    page = 1
+    if pages > 1:
+        page = st.number_input(
+            f"Page (sur {pages})",
+            min_value=1,
+            max_value=pages,
+            value=1,
+            key=f"table_page_{table}",
+        )
+    with span("query.table_page"):
+        table_df = get_table_page(table, page - 1, TABLE_PAGE_SIZE)
+    st.dataframe(table_df, hide_index=True)
+
+
+def display_tables(exercise):
     st.subheader("Tables")
 
     if isinstance(exercise["tables_used"], str):
@@ -281,8 +433,7 @@ def display_tables(con, exercise):
                 st.write(f"**Table : {table}**")
 
                 try:
-                    table_df = con.execute(f"SELECT * FROM {table}").df()
-                    st.dataframe(table_df, hide_index=True)
+                    display_table_preview(table.strip())
                 except Exception as e:
                     st.error(f"Erreur lors de la récupération de la table {table}: {e}")
 
@@ -310,32 +461,70 @@ def display_menu(con):
             anchor_icons=anchor_icons,
         )
 
+    mode = MODES[st.sidebar.radio("Mode", list(MODES), key="mode")]
+
+    theme = get_theme()
 
-    theme = get_theme(con)
+    author = get_author(theme)
 
-    author = get_author(con)
+    # En mode histoire, c'est le parcours qui fait monter la difficulté.
+    difficulty = get_difficulty(theme, author) if mode != "story" else None
 
-    difficulty = get_difficulty(con)
+    display_leaderboard()
 
     with st.sidebar:
         if st.session_state["authenticated"]:
             if st.button("Quitter"):
-                st.session_state["authenticated"] = False
-                st.session_state["username"] = None
+                logout()
                 st.rerun()
 
-    return theme, author, difficulty
+    return mode, theme, author, difficulty
 
 
-def launch_questions(exercises, exercise, con, exercise_name, solution_df, answer, theme, author, difficulty):
-    st.subheader(f"Bienvenue {st.session_state["username"]}")
-    st.divider()
+def format_exercises(exercises):
+    selected_columns = [
+        "exercise_name",
+        "theme",
+        "difficulty",
+        "last_reviewed",
+        "author",
+    ]
+    exercises_display = exercises[selected_columns].copy()
+    exercises_display["last_reviewed"] = exercises_display["last_reviewed"].dt.strftime(
+        "%Y-%m-%d"
+    )
+    return exercises_display
+
+
+@st.fragment
+def answer_panel(exercise_name, solution_df, answer, story=None, points=0):
+    # Fragment : saisir la requête ou la valider ne réexécute que ce panneau.
+    user_query = st.text_area("titre", key="user_input", label_visibility="hidden")
+    schedule_review(exercise_name, story)
 
-    filtered_exercises = exercises[
-        (exercises['difficulty'] == difficulty) &
-        (exercises['theme'] == theme) &
-        (exercises['author'] == author)
-        ]
+    if st.button("Valider la solution"):
+        correct = check_users_solution(
+            user_query, solution_df, is_ordered_query(answer)
+        )
+        # Seule une réponse effectivement comparée compte comme tentative.
+        if correct is not None:
+            record_answer(exercise_name, correct, points)
+
+
+def launch_questions(
+    exercises,
+    exercise,
+    con,
+    exercise_name,
+    solution_df,
+    answer,
+    theme,
+    author,
+    difficulty,
+    mode="srs",
+):
+    st.subheader(f"Bienvenue {st.session_state['username']}")
+    st.divider()
 
     if exercise is None:
         st.info("La selection ne contient aucun exercice")
@@ -343,23 +532,20 @@ def launch_questions(exercises, exercise, con, exercise_name, solution_df, answe
     with st.container():
         st.markdown('<div id="exercises_list"></div>', unsafe_allow_html=True)
         st.subheader("Liste des exercices")
-        selected_columns = ["exercise_name", "theme", "difficulty", "last_reviewed","author"]
-        exercises_display = filtered_exercises[selected_columns]
-        exercises_display["last_reviewed"] = exercises_display[
-            "last_reviewed"
-        ].dt.strftime("%Y-%m-%d")
-        st.dataframe(exercises_display, hide_index=True)
+        st.dataframe(exercises, hide_index=True)
 
     st.divider()
 
     with st.container():
         st.subheader(exercise["question"])
         st.markdown('<div id="response"></div>', unsafe_allow_html=True)
-        user_query = st.text_area("titre", key="user_input", label_visibility="hidden")
-        schedule_review(con, exercise_name)
-
-        if st.button("Valider la solution"):
-            check_users_solution(con, user_query, solution_df)
+        answer_panel(
+            exercise_name,
+            solution_df,
+            answer,
+            (theme, author) if mode == "story" else None,
+            exercise_points(exercise["difficulty"], mode),
+        )
 
         st.write("")
 
@@ -370,7 +556,7 @@ def launch_questions(exercises, exercise, con, exercise_name, solution_df, answe
             '<div id="tables"></div>,<style>:target::before {content: "";display: block;height: 80px;margin-top: -80px;}</style>',
             unsafe_allow_html=True,
         )
-        display_tables(con, exercise)
+        display_tables(exercise)
 
         st.divider()
 
@@ -378,73 +564,186 @@ def launch_questions(exercises, exercise, con, exercise_name, solution_df, answe
         display_solution(answer)
 
 
-def main_app():
+def is_admin(username):
+    # SQL_SRS_ADMINS : noms d'utilisateurs séparés par des virgules.
+    admins = os.environ.get("SQL_SRS_ADMINS", "")
+    return username in {name.strip() for name in admins.split(",") if name.strip()}
 
-    con = initialize_environment()
-
-    theme, author, difficulty = display_menu(con)
 
-    query = (
-        f"SELECT * FROM memory_state WHERE theme = '{theme}' AND difficulty = '{difficulty}'AND author = '{author}'"
-        if theme
-        else "SELECT * FROM memory_state"
+def admin_page():
+    st.subheader("Performances")
+    st.caption(
+        "Durées en millisecondes sur les dernières exécutions de chaque span, "
+        "depuis le démarrage du processus."
     )
-    exercises = con.execute(query).df().sort_values("last_reviewed")
-    print(exercises["last_reviewed"])
-    exercises["last_reviewed"] = pd.to_datetime(exercises["last_reviewed"])
-
-
-    today = pd.Timestamp(date.today())
-    if (exercises["last_reviewed"] > today).all():
-        st.write("Aucune révision prévue aujourd'hui.")
-        schedule_review(con, "all")  # Permet de réinitialiser les dates de révision
+    st.dataframe(summary(), hide_index=True)
+    if st.button("Réinitialiser les mesures"):
+        reset_spans()
+        st.rerun()
+
+    st.subheader("Nouveaux exercices")
+    pending = pending_bundles()
+    if not pending:
+        st.caption("Aucun lot en attente (python authoring.py add ...).")
         return
+    st.write(f"{len(pending)} lot(s) validé(s) en attente d'import.")
+    if st.button("Importer"):
+        # Le contenu de data/inbox a pu changer depuis le dépôt : revalidé.
+        with span("authoring.validate", bundles=len(pending)):
+            reports = validate_bundles(pending)
+        invalid = [report for report in reports if not report.ok]
+        if invalid:
+            for report in invalid:
+                st.error(f"{report.path} : {' ; '.join(report.errors)}")
+            st.error("Import annulé : lots invalides.")
+            return
+        try:
+            with span("authoring.import", bundles=len(pending)):
+                names = get_writer().execute(
+                    ingest_bundles, [load_bundle(path) for path in pending]
+                )
+        except Exception as e:
+            st.error(f"Import annulé : {e}")
+            return
+        archive_bundles(pending)
+        # Sans redémarrage : catalogue, sandbox et caches sont reconstruits.
+        invalidate_content()
+        st.success(f"{len(names)} exercice(s) ajouté(s).")
+
+
+def load_schedule(con, username, mode, theme, author, difficulty):
+    # Filtre résolu par les index de l'instantané, sans parcourir le catalogue.
+    with span("query.catalog"):
+        exercises = get_catalog_snapshot().filter(
+            theme=theme, author=author, difficulty=difficulty
+        )
+    # Échéances propres à l'utilisateur, à défaut la date initiale de l'exercice.
+    with span("query.due_dates"):
+        due_dates = get_due_dates(con, username)
+    exercises["last_reviewed"] = pd.to_datetime(
+        exercises["exercise_name"].map(due_dates).fillna(exercises["last_reviewed"])
+    )
+    exercises = exercises.sort_values("last_reviewed")
+
+    with span("query.next_due", mode=mode):
+        exercise_name = get_sequencer().next_exercise(
+            mode,
+            con,
+            username,
+            st.session_state,
+            theme=theme,
+            author=author,
+            difficulty=difficulty,
+        )
+    return exercises, format_exercises(exercises), exercise_name
 
-    exercise_name = exercises.iloc[0]["exercise_name"]
 
-    query_answer = (
-        f"SELECT answers FROM exercises WHERE exercise_name = '{exercise_name}'"
-    )
-    answer_df = con.execute(query_answer).fetchdf()
+def load_exercise(con, exercise, exercise_name):
+    with span("query.answer"):
+        answer = get_answer(con, exercise_name)
 
-    if not answer_df.empty:
-        answer = answer_df.iloc[0]["answers"]
+    if answer is not None:
         answer = answer.strip('"')
     else:
         answer = "No answer found for this exercise"
 
     try:
-        solution_df = con.execute(answer).df()
+        tables = tuple(parse_tables(exercise["tables_used"]))
+        with span("query.solution"):
+            solution_df = get_solution(
+                con, exercise_name, answer, tables, get_tables_fingerprint(tables)
+            )
+        error = None
 
     except Exception as e:
         solution_df = None
-        st.error(f"Erreur dans l'exécution de la requête SQL : {e}")
+        error = f"Erreur dans l'exécution de la requête SQL : {e}"
+
+    return answer, solution_df, error
+
+
+def main_app():
 
+    con = initialize_environment()
 
-    exercise = exercises.iloc[0]
+    mode, theme, author, difficulty = display_menu(con)
+    username = st.session_state["username"]
+
+    # Chaque étape n'est recalculée que si ses entrées ont changé : saisir une
+    # requête ou valider une réponse ne relit ni le catalogue ni la solution.
+    content_version = get_catalog_snapshot().version
+    # Échéances : changent avec les notes de la session et avec la date.
+    reviews_version = (st.session_state.get("reviews_version", 0), date.today())
+    filters = {"theme": theme, "author": author, "difficulty": difficulty}
+    session_key = get_sequencer().state_key(mode, st.session_state, **filters)
+    exercises, exercises_display, exercise_name = memoize(
+        "schedule",
+        (
+            username,
+            mode,
+            session_key,
+            *filters.values(),
+            content_version,
+            reviews_version,
+        ),
+        lambda: load_schedule(con, username, mode, theme, author, difficulty),
+    )
+    if exercise_name is None:
+        if mode == "story" and not exercises.empty:
+            st.write("Parcours terminé : tous les exercices ont été réussis.")
+        elif mode == "random":
+            st.info("La selection ne contient aucun exercice")
+        else:
+            st.write("Aucune révision prévue aujourd'hui.")
+        # Permet de réinitialiser les dates de révision (et le parcours).
+        schedule_review("all", (theme, author) if mode == "story" else None)
+        return
 
+    exercise = exercises[exercises["exercise_name"] == exercise_name].iloc[0]
 
-    launch_questions(exercises, exercise, con, exercise_name, solution_df, answer, theme, author, difficulty)
+    answer, solution_df, error = memoize(
+        "exercise",
+        (exercise_name, content_version),
+        lambda: load_exercise(con, exercise, exercise_name),
+    )
+    if error is not None:
+        st.error(error)
+
+    launch_questions(
+        exercises_display,
+        exercise,
+        con,
+        exercise_name,
+        solution_df,
+        answer,
+        theme,
+        author,
+        difficulty,
+        mode,
+    )
 
 
 if __name__ == "__main__":
-    download_json()
-    if "json" not in os.listdir():
-        logging.error(os.listdir())
-        logging.error("Creating folder: json")
-        os.mkdir("json")
-
-    if "users.json" not in os.listdir("json"):
-        exec(open("json/json_init.py").read())
+    # Synchronisation Drive et préparation de la base en arrière-plan : la
+    # page de connexion s'affiche sans les attendre.
+    start_background_sync()
 
     st.title("Système de révision SQL")
 
     if "authenticated" not in st.session_state:
         st.session_state["authenticated"] = False
         st.session_state["username"] = None
+        restore_session()
 
     if st.session_state["authenticated"]:
-        main_app()
+        page = "Exercices"
+        if is_admin(st.session_state["username"]):
+            page = st.sidebar.radio("Page", ["Exercices", "Performances"])
+        if page == "Performances":
+            admin_page()
+        else:
+            with span("app.main"):
+                main_app()
 
     else:
         st.sidebar.title("Navigation")
@@ -0,0 +1,76 @@
+import hashlib
+import logging
+import os
+import sys
+
+import gdown
+import streamlit as st
+
+from drive import is_offline
+
+ARTIFACT_VERSION_FILE = "data/artifact_version"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_config():
+    """Section [database_artifact] des secrets : file_id, sha256, version."""
+    # Sans fichier de secrets, tout accès à st.secrets affiche une erreur.
+    if not st.secrets.load_if_toml_exists():
+        return None
+    config = st.secrets.get("database_artifact")
+    return dict(config) if config else None
+
+
+def fetch_database_artifact(database):
+    """Télécharge la base pré-construite quand aucune base locale n'existe.
+
+    Une base existante n'est jamais remplacée : elle contient l'état de
+    révision des utilisateurs. Le fichier n'est installé que si son sha256
+    correspond à celui déclaré dans les secrets.
+    """
+    if is_offline() or os.path.exists(database):
+        return False
+    config = artifact_config()
+    if config is None:
+        return False
+
+    tmp_path = f"{database}.download"
+    try:
+        gdown.download(
+            f"https://drive.google.com/uc?id={config['file_id']}",
+            tmp_path,
+            quiet=True,
+        )
+        checksum = file_sha256(tmp_path)
+        if checksum != config["sha256"]:
+            logging.error(
+                f"Base pré-construite {config.get('version')} ignorée : "
+                f"sha256 {checksum} au lieu de {config['sha256']}."
+            )
+            return False
+        os.replace(tmp_path, database)
+    except Exception as e:
+        logging.error(f"Téléchargement de la base pré-construite impossible : {e}")
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    with open(ARTIFACT_VERSION_FILE, "w") as f:
+        f.write(str(config.get("version", "")))
+    print(f"Base pré-construite {config.get('version')} installée.")
+    return True
+
+
+if __name__ == "__main__":
+    # python artifact.py data/exercises_sql_tables.duckdb
+    # Affiche le sha256 à reporter dans [database_artifact] après publication.
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/exercises_sql_tables.duckdb"
+    print(file_sha256(path))
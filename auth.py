@@ -1,102 +1,171 @@
-import hashlib
+import os
 import random
 import string
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import json
 import streamlit as st
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
+from filelock import FileLock
+from drive import DriveFile, LocalDriveFile, is_offline
+from outbox import FileTransport, Outbox, SmtpTransport
+from passwords import hasher_from_env
+from tracing import traced
+from user_store import DuckDBUserStore, JsonDriveUserStore
+
+
+USERS_MIRROR_FILE = "json/users.json"
+USERS_DATABASE = "data/users.duckdb"
+LOCAL_DRIVE_FILE = "data/local_drive/users.json"
+SMTP_SERVER = "smtp-mail.outlook.com"
+SMTP_PORT = 587
+OFFLINE_SENDER = "sql-srs@localhost"
+
+
+@st.cache_resource
+def get_user_store():
+    # SQL_SRS_USER_BACKEND : "drive" (users.json sur Google Drive) ou "duckdb".
+    if os.environ.get("SQL_SRS_USER_BACKEND", "drive") == "duckdb":
+        return DuckDBUserStore(USERS_DATABASE)
+
+    # SQL_SRS_LOCAL_DRIVE permet de remplacer Google Drive par un fichier local.
+    local_path = os.environ.get("SQL_SRS_LOCAL_DRIVE")
+    if local_path is None and is_offline():
+        local_path = LOCAL_DRIVE_FILE
+    if local_path:
+        drive = LocalDriveFile(local_path)
+    else:
+        # Les secrets ne sont lus qu'au premier accès, pas à l'import.
+        drive = DriveFile(
+            st.secrets["google_drive"]["users_file_id"],
+            st.secrets["google_credentials"],
+        )
+    return JsonDriveUserStore(drive, mirror_path=USERS_MIRROR_FILE)
 
 
-GOOGLE_DRIVE_FILE_ID = st.secrets["google_drive"]["users_file_id"]
-SERVICE_ACCOUNT_INFO = st.secrets["google_credentials"]
-API_NAME = "drive"
-API_VERSION = "v3"
+def get_sender_email():
+    if is_offline():
+        return OFFLINE_SENDER
+    return st.secrets["hotmail"]["sender_email"]
 
 
+@st.cache_resource
+def get_outbox():
+    if is_offline():
+        transport = FileTransport()
+    else:
+        transport = SmtpTransport(
+            SMTP_SERVER,
+            SMTP_PORT,
+            username=st.secrets["hotmail"]["sender_email"],
+            password=st.secrets["hotmail"]["sender_password"],
+        )
+    return Outbox(transport)
+
+
+@traced("auth.download_json")
 def download_json():
-    service = authenticate_google_drive()
     try:
-        file_content = service.files().get_media(fileId=GOOGLE_DRIVE_FILE_ID).execute()
-
-        with open("json/users.json", "wb") as f:
-            f.write(file_content)
+        get_user_store().load(force=True)
         print("Fichier 'users.json' téléchargé avec succès.")
+        return True
     except Exception as e:
         st.error(f"Erreur lors du téléchargement des utilisateurs : {e}")
+        return False
 
 
-def authenticate_google_drive():
-    try:
-        credentials = service_account.Credentials.from_service_account_info(
-            SERVICE_ACCOUNT_INFO, scopes=["https://www.googleapis.com/auth/drive"]
-        )
-        service = build(API_NAME, API_VERSION, credentials=credentials)
-        return service
-    except HttpError as error:
-        st.error(f"Une erreur s'est produite lors de l'authentification : {error}")
-        st.stop()
-
-
+@traced("auth.load_users")
 def load_users():
-    service = authenticate_google_drive()
     try:
-        file_content = service.files().get_media(fileId=GOOGLE_DRIVE_FILE_ID).execute()
-
-        with open("json/users.json", "wb") as f:
-          f.write(file_content)
-
-        with open("json/users.json", "r") as f:
-            print("ok")
-            return json.load(f)
-
-    except FileNotFoundError:
-        return {}
+        return get_user_store().all()
     except Exception as e:
         st.error(f"Erreur lors du chargement des utilisateurs : {e}")
         return {}
 
 
+@traced("auth.save_users")
 def save_users(users):
     try:
-        with open("json/users.json", "w") as f:
-            json.dump(users, f, indent=4)
+        get_user_store().replace_all(users)
+    except Exception as e:
+        st.error(f"Erreur lors de la sauvegarde des utilisateurs : {e}")
+        print(f"Erreur lors de la sauvegarde des utilisateurs : {e}")
+
+
+def save_user(username, user):
+    try:
+        get_user_store().put(username, user)
+        return True
+    except Exception as e:
+        st.error(f"Erreur lors de la sauvegarde des utilisateurs : {e}")
+        return False
 
-        service = authenticate_google_drive()
-        media = MediaFileUpload("json/users.json", mimetype="application/json")
 
-        service.files().get(fileId=GOOGLE_DRIVE_FILE_ID).execute()
-        service.files().update(fileId=GOOGLE_DRIVE_FILE_ID, media_body=media).execute()
+def init_users_file():
+    """Crée la copie locale json/users.json (backend JSON uniquement).
 
-        st.success("Fichier 'users.json' mis à jour sur Google Drive.")
+    Le chargement écrit la copie à partir de Drive (vide si Drive l'est) :
+    rien n'est envoyé, les utilisateurs distants ne sont jamais écrasés. Le
+    backend DuckDB n'a pas de fichier à créer.
+    """
+    store = get_user_store()
+    if not isinstance(store, JsonDriveUserStore):
+        return
+    os.makedirs(os.path.dirname(USERS_MIRROR_FILE), exist_ok=True)
+    with FileLock(f"{USERS_MIRROR_FILE}.lock"):
+        if not os.path.exists(USERS_MIRROR_FILE):
+            store.load(force=True)
 
+
+def get_user(username):
+    try:
+        return get_user_store().get(username)
     except Exception as e:
-        st.error(f"Erreur lors de la sauvegarde des utilisateurs : {e}")
-        print(f"Erreur lors de la sauvegarde des utilisateurs : {e}")
+        st.error(f"Erreur lors du chargement des utilisateurs : {e}")
+        return None
+
+
+def find_user_by_email(email):
+    try:
+        username, _ = get_user_store().get_by_email(email)
+        return username
+    except Exception as e:
+        st.error(f"Erreur lors du chargement des utilisateurs : {e}")
+        return None
+
+
+PASSWORD_HASHER = hasher_from_env()
 
 
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return PASSWORD_HASHER.hash(password)
 
 
 def create_account(username, password, email):
-    users = load_users()
-    if username not in users:
-        users[username] = {"password": hash_password(password), "email": email}
-        save_users(users)
-        return True
-    return False
+    """Renvoie True si le compte est créé, False si le nom est pris.
+
+    Un email déjà utilisé affiche sa propre erreur et renvoie None.
+    """
+    try:
+        if get_user_store().get_by_email(email)[0] is not None:
+            st.error("Un compte avec cet email existe déjà.")
+            return None
+        return get_user_store().add(
+            username, {"password": hash_password(password), "email": email}
+        )
+    except Exception as e:
+        st.error(f"Erreur lors de la sauvegarde des utilisateurs : {e}")
+        return False
 
 
 def verify_password(username, password):
-    users = load_users()
-    if username in users and users[username]["password"] == hash_password(password):
-        return True
-    return False
+    user = get_user(username)
+    if user is None or not PASSWORD_HASHER.verify(password, user["password"]):
+        return False
+    # Mot de passe en clair disponible : on migre les anciens hachages
+    # (SHA-256 sans sel, coût inférieur) vers les paramètres courants.
+    if PASSWORD_HASHER.needs_rehash(user["password"]):
+        user["password"] = hash_password(password)
+        save_user(username, user)
+    return True
 
 
 def generate_reset_code():
@@ -105,54 +174,41 @@ def generate_reset_code():
 
 def send_reset_email(email, username):
     reset_code = generate_reset_code()
-    users = load_users()
-    print(reset_code)
-    if username in users:
-        users[username]["reset_code"] = reset_code
-        save_users(users)
-    else:
+    user = get_user(username)
+    if user is None:
         raise ValueError("Utilisateur introuvable.")
+    user["reset_code"] = reset_code
+    if not save_user(username, user):
+        return False
 
     receiver_email = email
     subject = "Code de réinitialisation de mot de passe"
     body = f"Bonjour {username},\n\nVotre code de réinitialisation est : {reset_code}\n\nCordialement."
 
+    sender_email = get_sender_email()
     msg = MIMEMultipart()
-    msg['From'] = st.secrets["hotmail"]["sender_email"]
+    msg["From"] = sender_email
     msg["To"] = receiver_email
     msg["Subject"] = subject
     msg.attach(MIMEText(body, "plain"))
 
-    smtp_server = "smtp-mail.outlook.com"
-    smtp_port = 587
-
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(
-                st.secrets["hotmail"]["sender_email"],
-                st.secrets["hotmail"]["sender_password"],
-            )
-            server.sendmail(
-                st.secrets["hotmail"]["sender_email"], receiver_email, msg.as_string()
-            )
-            print("E-mail envoyé avec succès.")
-    except smtplib.SMTPException as e:
-        print(f"Erreur SMTP : {e}")
+    # Envoi asynchrone : le worker de l'outbox gère la session SMTP et les
+    # nouvelles tentatives.
+    get_outbox().enqueue(sender_email, receiver_email, msg.as_string())
+    return True
 
 
 def verify_reset_code(username, reset_code):
-    users = load_users()
-    if username in users and users[username].get("reset_code") == reset_code:
+    user = get_user(username)
+    if user is not None and user.get("reset_code") == reset_code:
         return True
     return False
 
 
 def update_password(username, new_password):
-    users = load_users()
-    if username in users:
-        users[username]["password"] = hash_password(new_password)
-        users[username].pop("reset_code", None)
-        save_users(users)
-        return True
+    user = get_user(username)
+    if user is not None:
+        user["password"] = hash_password(new_password)
+        user.pop("reset_code", None)
+        return save_user(username, user)
     return False
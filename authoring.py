@@ -0,0 +1,331 @@
+"""Ajout d'exercices par lots : validation, puis ajout à la base sans reconstruction.
+
+Un lot est un répertoire contenant bundle.json et les fichiers de ses tables :
+
+    {
+      "tables": {"ventes": "ventes.csv", "clients": "clients.parquet"},
+      "exercises": [
+        {"exercise_name": "ventes_par_client", "theme": "joins",
+         "difficulty": "medium", "author": "julien",
+         "question": "...", "answers": "SELECT ...",
+         "tables_used": "ventes,clients"}
+      ]
+    }
+
+    python authoring.py validate lots/*        # validation seule
+    python authoring.py add lots/* --workers 4 # validation puis ajout
+
+Chaque lot est validé dans un processus séparé, sur une base DuckDB en
+mémoire : ses tables sont chargées et chaque solution exécutée. L'ajout se
+fait ensuite dans une seule transaction. Si l'application tient la base, les
+lots validés sont déposés dans data/inbox et importés depuis la page
+Performances.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import duckdb
+
+from artifact import file_sha256
+from dao import quote_identifier, table_exists
+from executor import check_select
+from init_db import DATABASE, EXERCISE_COLUMNS, database_lock, ensure_manifest
+from sequencer import DIFFICULTY_ORDER
+from solutions import content_hash, parse_tables
+
+BUNDLE_FILE = "bundle.json"
+INBOX_DIR = "data/inbox"
+IMPORTED_DIR = "data/inbox/imported"
+REQUIRED_FIELDS = (
+    "exercise_name",
+    "theme",
+    "difficulty",
+    "author",
+    "question",
+    "answers",
+    "tables_used",
+)
+TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+READERS = {".csv": "read_csv_auto", ".parquet": "read_parquet"}
+INITIAL_REVIEW = "1970-01-01"
+
+
+@dataclass
+class Bundle:
+    path: str
+    tables: dict
+    exercises: list
+
+
+@dataclass
+class ValidationReport:
+    path: str
+    errors: list = field(default_factory=list)
+    exercises: int = 0
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def load_bundle(path):
+    """Lit bundle.json ; ValueError si le JSON ou sa structure est invalide."""
+    with open(os.path.join(path, BUNDLE_FILE), encoding="utf-8") as f:
+        content = json.load(f)
+    if not isinstance(content, dict):
+        raise ValueError("objet JSON attendu")
+    if not isinstance(content.get("tables", {}), dict) or not all(
+        isinstance(file, str) for file in content.get("tables", {}).values()
+    ):
+        raise ValueError('"tables" doit associer un nom de table à un fichier')
+    if not isinstance(content.get("exercises", []), list) or not all(
+        isinstance(exercise, dict) for exercise in content.get("exercises", [])
+    ):
+        raise ValueError('"exercises" doit être une liste d\'objets')
+    tables = {
+        name: os.path.join(path, file)
+        for name, file in content.get("tables", {}).items()
+    }
+    return Bundle(os.path.abspath(path), tables, content.get("exercises", []))
+
+
+def table_source(path):
+    """SELECT qui lit un fichier de table (CSV ou Parquet)."""
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Format de table non supporté : {path}")
+    literal = "'" + os.path.abspath(path).replace("'", "''") + "'"
+    return f"SELECT * FROM {reader}({literal})"
+
+
+def solution_query(exercise):
+    return str(exercise["answers"]).strip().strip('"').rstrip(";")
+
+
+def _check_solution(con, query):
+    check_select(con, query)
+    con.execute(query).fetchall()
+
+
+def validate_bundle(path):
+    """Vérifie un lot sur une base en mémoire ; ne lève jamais d'exception."""
+    report = ValidationReport(path)
+    try:
+        bundle = load_bundle(path)
+    except (OSError, ValueError) as e:
+        report.errors.append(f"{BUNDLE_FILE} illisible : {e}")
+        return report
+
+    report.exercises = len(bundle.exercises)
+    if not bundle.exercises:
+        report.errors.append("aucun exercice")
+
+    con = duckdb.connect()
+    try:
+        for name, file in bundle.tables.items():
+            if not TABLE_NAME.match(name):
+                report.errors.append(f"nom de table invalide : {name}")
+                continue
+            try:
+                con.execute(
+                    f"CREATE TABLE {quote_identifier(name)} AS {table_source(file)}"
+                )
+            except (ValueError, duckdb.Error) as e:
+                report.errors.append(f"table {name} : {e}")
+
+        names = set()
+        for i, exercise in enumerate(bundle.exercises):
+            label = exercise.get("exercise_name") or f"exercice {i + 1}"
+            missing = [key for key in REQUIRED_FIELDS if not exercise.get(key)]
+            if missing:
+                report.errors.append(f"{label} : champs manquants {missing}")
+                continue
+            not_text = [
+                key for key in REQUIRED_FIELDS if not isinstance(exercise[key], str)
+            ]
+            if not_text:
+                report.errors.append(f"{label} : champs non textuels {not_text}")
+                continue
+            if label in names:
+                report.errors.append(f"{label} : nom en double")
+            names.add(label)
+            if exercise["difficulty"] not in DIFFICULTY_ORDER:
+                report.errors.append(
+                    f"{label} : difficulté {exercise['difficulty']!r} inconnue"
+                )
+            unknown = set(parse_tables(exercise["tables_used"])) - set(bundle.tables)
+            if unknown:
+                # Le lot doit se suffire : la base de l'application n'est pas
+                # accessible aux processus de validation.
+                report.errors.append(f"{label} : tables absentes du lot {unknown}")
+                continue
+            try:
+                _check_solution(con, solution_query(exercise))
+            except (ValueError, duckdb.Error) as e:
+                report.errors.append(f"{label} : solution invalide : {e}")
+    finally:
+        con.close()
+    return report
+
+
+def validate_bundles(paths, workers=None):
+    """Valide les lots en parallèle, un processus par lot."""
+    if len(paths) <= 1:
+        return [validate_bundle(path) for path in paths]
+    # spawn : un fork depuis le serveur Streamlit (multithread) peut hériter
+    # de verrous tenus par d'autres threads.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return list(pool.map(validate_bundle, paths))
+
+
+def exercise_hash(exercise):
+    return content_hash(*(exercise.get(key) for key in REQUIRED_FIELDS))
+
+
+def exercise_row(exercise):
+    """Valeurs de memory_state, dans l'ordre des colonnes de data/exercises.csv."""
+    values = {
+        **exercise,
+        "last_reviewed": exercise.get("last_reviewed", INITIAL_REVIEW),
+        # "tables" reprend tables_used.
+        "tables": exercise["tables_used"],
+    }
+    return [values.get(column) for column in EXERCISE_COLUMNS]
+
+
+def ingest_bundles(con, bundles):
+    """Ajoute les tables et exercices des lots, dans la transaction en cours.
+
+    Refuse tout lot qui remplacerait un exercice ou une table existants.
+    Les ajouts sont inscrits au manifeste (kinds authored_*) : init_db ne
+    les supprime pas et la version du catalogue change. Renvoie les noms
+    des exercices ajoutés. Utilisé tel quel par DatabaseWriter.
+    """
+    exercises = [exercise for bundle in bundles for exercise in bundle.exercises]
+    table_files = [item for bundle in bundles for item in bundle.tables.items()]
+    tables = dict(table_files)
+    names = [exercise["exercise_name"] for exercise in exercises]
+
+    conflicts = [name for name in tables if table_exists(con, name)]
+    existing = con.execute(
+        "SELECT exercise_name FROM memory_state WHERE list_contains(?, exercise_name)",
+        [names],
+    ).fetchall()
+    conflicts += [name for (name,) in existing]
+    # Doublons entre lots d'un même import.
+    for counts in (Counter(names), Counter(name for name, _ in table_files)):
+        conflicts += [name for name, count in counts.items() if count > 1]
+    if conflicts:
+        raise ValueError(f"Noms déjà utilisés : {', '.join(sorted(set(conflicts)))}")
+
+    for name, file in tables.items():
+        con.execute(f"CREATE TABLE {quote_identifier(name)} AS {table_source(file)}")
+
+    rows = [exercise_row(exercise) for exercise in exercises]
+    columns = ", ".join(EXERCISE_COLUMNS)
+    placeholders = ", ".join("?" for _ in EXERCISE_COLUMNS)
+    con.executemany(
+        f"INSERT INTO memory_state ({columns}) VALUES ({placeholders})", rows
+    )
+
+    ensure_manifest(con)
+    con.executemany(
+        "INSERT INTO build_manifest VALUES (?, ?, ?)",
+        [["authored_exercise", e["exercise_name"], exercise_hash(e)] for e in exercises]
+        + [
+            ["authored_table", name, file_sha256(file)] for name, file in tables.items()
+        ],
+    )
+    return names
+
+
+def add_bundles(con, bundles):
+    """ingest_bundles dans une transaction dédiée."""
+    con.execute("BEGIN TRANSACTION")
+    try:
+        names = ingest_bundles(con, bundles)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return names
+
+
+def queue_bundles(paths, inbox=INBOX_DIR):
+    """Dépose des lots validés dans la boîte d'import de l'application."""
+    os.makedirs(inbox, exist_ok=True)
+    for path in paths:
+        target = os.path.join(inbox, os.path.basename(os.path.abspath(path)))
+        shutil.copytree(path, target)
+
+
+def pending_bundles(inbox=INBOX_DIR):
+    if not os.path.isdir(inbox):
+        return []
+    return sorted(
+        os.path.join(inbox, name)
+        for name in os.listdir(inbox)
+        if os.path.exists(os.path.join(inbox, name, BUNDLE_FILE))
+    )
+
+
+def archive_bundles(paths, archive=IMPORTED_DIR):
+    os.makedirs(archive, exist_ok=True)
+    for path in paths:
+        shutil.move(path, os.path.join(archive, os.path.basename(path)))
+
+
+def print_reports(reports):
+    for report in reports:
+        status = "ok" if report.ok else "ERREUR"
+        print(f"{report.path} : {status} ({report.exercises} exercice(s))")
+        for error in report.errors:
+            print(f"  - {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["validate", "add"])
+    parser.add_argument("bundles", nargs="+")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--database", default=DATABASE)
+    args = parser.parse_args()
+
+    reports = validate_bundles(args.bundles, args.workers)
+    print_reports(reports)
+    if not all(report.ok for report in reports):
+        sys.exit(1)
+    if args.command == "validate":
+        return
+
+    bundles = [load_bundle(path) for path in args.bundles]
+    with database_lock(args.database):
+        try:
+            con = duckdb.connect(args.database)
+        except duckdb.IOException:
+            # Base ouverte par l'application : elle fera l'import.
+            queue_bundles(args.bundles)
+            print(f"Base occupée : lots déposés dans {INBOX_DIR}.")
+            return
+        try:
+            names = add_bundles(con, bundles)
+        except ValueError as e:
+            print(f"Ajout annulé : {e}")
+            sys.exit(1)
+        finally:
+            con.close()
+    print(f"{len(names)} exercice(s) ajouté(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Débit et latence des connexions selon le coût du hachage des mots de passe.
+
+    python -m benchmarks.bench_passwords --threads 4 --logins 64
+
+Chaque réglage est mesuré avec `--threads` connexions simultanées, comme
+plusieurs sessions Streamlit qui se connectent en même temps. hashlib.scrypt
+et bcrypt relâchent le GIL : le débit doit croître avec le nombre de threads
+tant que la mémoire (128 * n * r octets par hachage scrypt) le permet.
+"""
+
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passwords import PasswordHasher
+
+SETTINGS = {
+    "scrypt-n2^13": dict(scheme="scrypt", scrypt_n=2**13),
+    "scrypt-n2^14": dict(scheme="scrypt", scrypt_n=2**14),
+    "scrypt-n2^15": dict(scheme="scrypt", scrypt_n=2**15),
+    "scrypt-n2^16": dict(scheme="scrypt", scrypt_n=2**16),
+    "bcrypt-10": dict(scheme="bcrypt", bcrypt_rounds=10),
+    "bcrypt-12": dict(scheme="bcrypt", bcrypt_rounds=12),
+}
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def bench(name, settings, threads, logins):
+    hasher = PasswordHasher(**settings)
+    stored = hasher.hash("mot-de-passe")
+
+    def login(_):
+        start = time.perf_counter()
+        assert hasher.verify("mot-de-passe", stored)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(login, range(threads)))  # échauffement
+        start = time.perf_counter()
+        latencies = list(pool.map(login, range(logins)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "setting": name,
+        "threads": threads,
+        "logins": logins,
+        "throughput_per_s": round(logins / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument(
+        "--settings",
+        nargs="*",
+        choices=sorted(SETTINGS),
+        default=sorted(SETTINGS),
+    )
+    args = parser.parse_args()
+
+    results = [
+        bench(name, SETTINGS[name], args.threads, args.logins) for name in args.settings
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare deux résultats de benchmarks.run et signale les régressions.
+
+    python -m benchmarks.compare_runs base.json new.json --threshold 1.2
+
+Le code de sortie vaut 1 si une mesure commune dépasse `threshold` fois sa
+valeur de référence (p50 par défaut).
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(base, new, metric="p50_ms", threshold=1.2):
+    rows = []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        before = base["results"].get(name, {}).get(metric)
+        after = new["results"].get(name, {}).get(metric)
+        if before is None or after is None:
+            rows.append((name, before, after, None, "absent"))
+            continue
+        ratio = after / before if before else float("inf")
+        status = "régression" if ratio > threshold else ""
+        if ratio < 1 / threshold:
+            status = "amélioration"
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_ms")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    if base["meta"]["params"] != new["meta"]["params"]:
+        print("Attention : les paramètres des deux exécutions diffèrent.")
+
+    print(
+        f"{'mesure':<24} {base['meta']['commit'] or 'base':>12} "
+        f"{new['meta']['commit'] or 'new':>12} {'ratio':>7}"
+    )
+    rows = compare(base, new, args.metric, args.threshold)
+    for name, before, after, ratio, status in rows:
+        before_text = "-" if before is None else f"{before:.3f}"
+        after_text = "-" if after is None else f"{after:.3f}"
+        ratio_text = "-" if ratio is None else f"{ratio:.2f}"
+        print(
+            f"{name:<24} {before_text:>12} {after_text:>12} {ratio_text:>7}  {status}"
+        )
+
+    if any(status == "régression" for *_, status in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Test de charge : sessions Streamlit simultanées pilotées par AppTest.
+
+    python -m benchmarks.load_app --sessions 8 --iterations 5
+
+Chaque session crée un compte, se connecte, change de filtres, soumet la
+solution de l'exercice affiché puis le note, en boucle. Tout tourne hors
+ligne (SQL_SRS_OFFLINE=1 : Drive et SMTP remplacés par des fichiers
+locaux) sur des données synthétiques, dans un répertoire temporaire.
+
+Le rapport JSON donne le débit, les percentiles de chaque action et, pour
+la contention, l'attente d'une connexion du pool sandbox, la durée des
+écritures de révision et le nombre de conflits de transaction DuckDB.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from unittest import mock
+
+import numpy as np
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import (
+    MemoryCacheStorageManager,
+)
+from streamlit.testing.v1 import AppTest, app_test
+from streamlit.testing.v1.util import build_mock_config_get_option
+
+import tracing
+from benchmarks.synthetic import generate_exercises, generate_tables, write_csvs
+from scheduler import REVIEW_GRADES
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTENTION_SPANS = [
+    "executor.acquire",
+    "query.record_review",
+    "query.user",
+    "writer.batch",
+]
+
+
+def shared_runtime():
+    """Runtime et configuration uniques pour toutes les sessions.
+
+    AppTest installe puis retire, à chaque exécution, un Runtime factice et
+    un remplaçant de config.get_option. Avec plusieurs sessions en
+    parallèle, une session perdrait l'un ou l'autre au milieu d'un script
+    (arbre d'éléments vide, identifiants de widgets incohérents) et
+    st.cache_data ne serait jamais partagé. On les installe une seule fois,
+    comme sur un vrai serveur.
+    """
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    return [
+        mock.patch.object(Runtime, "instance", classmethod(lambda cls: runtime)),
+        mock.patch.object(Runtime, "exists", classmethod(lambda cls: True)),
+        mock.patch.object(
+            config,
+            "get_option",
+            build_mock_config_get_option({"global.appTest": True}),
+        ),
+        mock.patch.object(
+            app_test, "patch_config_options", lambda overrides: nullcontext()
+        ),
+    ]
+
+
+def prepare_workdir(workdir, args):
+    tables_df = generate_tables(args.tables, args.rows, args.seed)
+    write_csvs(
+        workdir, generate_exercises(args.exercises, tables_df, args.seed), tables_df
+    )
+    os.symlink(os.path.join(REPO_DIR, "app.py"), os.path.join(workdir, "app.py"))
+
+
+class HarnessError(Exception):
+    pass
+
+
+class Session:
+    def __init__(self, index, args, timings, errors):
+        self.username = f"load_{index}"
+        self.args = args
+        self.timings = timings
+        self.errors = errors
+        self.rng = random.Random(args.seed + index)
+        self.at = AppTest.from_file("app.py", default_timeout=args.timeout)
+
+    def step(self, action, widget=None):
+        start = time.perf_counter()
+        (widget or self.at).run()
+        self.timings[action].append((time.perf_counter() - start) * 1000)
+        if not self.at.title:
+            # Le titre est toujours affiché par app.py : voir run().
+            raise HarnessError("exécution sans aucun élément")
+        for exception in self.at.exception:
+            self.errors[exception.message].append(action)
+
+    def button(self, label):
+        for button in self.at.button:
+            if button.label == label:
+                return button
+        raise LookupError(f"Bouton introuvable : {label}")
+
+    def create_account(self):
+        self.step("page.load")
+        self.at.sidebar.radio[0].set_value("Créer un compte")
+        self.step("page.navigate")
+        self.at.text_input[0].input(self.username)
+        self.at.text_input[1].input("mot-de-passe")
+        self.at.text_input[2].input(f"{self.username}@example.com")
+        self.step("account.create", self.button("Créer le compte").click())
+
+    def login(self):
+        if not self.at.sidebar.radio:
+            self.step("page.load")
+        self.at.sidebar.radio[0].set_value("Connexion")
+        self.step("page.navigate")
+        self.at.text_input[0].input(self.username)
+        self.at.text_input[1].input("mot-de-passe")
+        self.step("login", self.button("Se connecter").click())
+
+    def filter(self):
+        # Après un st.rerun, AppTest peut garder une zone de saisie dont l'état
+        # a été purgé : on lui donne une valeur explicite avant de relancer.
+        for text_area in self.at.text_area:
+            text_area.input("")
+        sidebar = self.at.sidebar
+        for widget in [*sidebar.selectbox, *sidebar.select_slider]:
+            if widget.options:
+                widget.set_value(self.choose(widget.options))
+        self.step("filter")
+
+    def choose(self, options):
+        # AppTest expose les libellés affichés, "valeur (nombre d'exercices)" :
+        # set_value attend la valeur elle-même.
+        return self.rng.choice(options).rsplit(" (", 1)[0]
+
+    def answer_and_review(self):
+        if not self.at.text_area:
+            # Aucun exercice dû pour ces filtres : on repart de zéro.
+            self.step(
+                "review.reset", self.button("Réinitialiser toutes les dates").click()
+            )
+            return
+        self.at.text_area[0].input(self.at.text[-1].value)
+        self.step("answer.submit", self.button("Valider la solution").click())
+        label = self.rng.choice(list(REVIEW_GRADES))
+        self.step("review.record", self.button(label).click())
+
+    def run(self):
+        try:
+            self.create_account()
+            self.login()
+        except HarnessError as e:
+            self.errors[f"harness: {type(e).__name__}: {e}"].append("login")
+            return
+        except Exception as e:
+            self.errors[f"{type(e).__name__}: {e}"].append("login")
+            return
+        for _ in range(self.args.iterations):
+            try:
+                self.filter()
+                self.answer_and_review()
+            except Exception as e:
+                # AppTest n'est pas conçu pour des sessions simultanées dans un
+                # même processus : une exécution revient parfois vide ou avec
+                # un état de session perdu. L'incident est compté à part et la
+                # session repart d'une nouvelle connexion.
+                self.errors[f"harness: {type(e).__name__}: {e}"].append("session")
+                self.at = AppTest.from_file("app.py", default_timeout=self.args.timeout)
+                try:
+                    self.login()
+                except Exception as e:
+                    self.errors[f"harness: {type(e).__name__}: {e}"].append("login")
+                    return
+
+
+def percentiles(durations):
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+    return {
+        "count": len(durations),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(max(durations), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--exercises", type=int, default=200)
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--scrypt-n", type=int, default=2**14)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fichier JSON (sortie standard par défaut)")
+    args = parser.parse_args()
+
+    os.environ["SQL_SRS_OFFLINE"] = "1"
+    os.environ["SQL_SRS_PASSWORD_SCRYPT_N"] = str(args.scrypt_n)
+    output = os.path.abspath(args.output) if args.output else None
+    timings = defaultdict(list)
+    errors = defaultdict(list)
+
+    patches = shared_runtime()
+    for patch in patches:
+        patch.start()
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="sql_srs_load_") as workdir:
+            prepare_workdir(workdir, args)
+            os.chdir(workdir)
+
+            # Démarrage (base, sandbox, utilisateurs) mesuré à part.
+            start = time.perf_counter()
+            warmup = Session(-1, args, defaultdict(list), errors)
+            warmup.create_account()
+            warmup.login()
+            startup_ms = (time.perf_counter() - start) * 1000
+            tracing.reset()
+
+            sessions = [Session(i, args, timings, errors) for i in range(args.sessions)]
+            threads = [
+                threading.Thread(target=session.run, name=f"load-{session.username}")
+                for session in sessions
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        for patch in patches:
+            patch.stop()
+
+    spans = tracing.summary().set_index("span")
+    actions = sum(len(durations) for durations in timings.values())
+    report = {
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+        "startup_ms": round(startup_ms, 2),
+        "elapsed_s": round(elapsed, 3),
+        "actions": actions,
+        "throughput_actions_per_s": round(actions / elapsed, 2),
+        "actions_ms": {name: percentiles(d) for name, d in sorted(timings.items())},
+        "contention": {
+            "spans_ms": spans.loc[spans.index.isin(CONTENTION_SPANS)].to_dict("index"),
+            "transaction_conflicts": sum(
+                len(where)
+                for message, where in errors.items()
+                if "Conflict" in message or "TransactionException" in message
+            ),
+        },
+        "errors": {message: len(where) for message, where in errors.items()},
+    }
+    text = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
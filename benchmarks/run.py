@@ -0,0 +1,354 @@
+"""Benchmarks des opérations principales sur des données synthétiques.
+
+    python -m benchmarks.run --users 1000 --exercises 500 --tables 50 --rows 1000 \\
+        --output bench-$(git rev-parse --short HEAD).json
+
+Tout est exécuté hors ligne dans un répertoire temporaire : init_db, le
+catalogue et ses filtres, le choix du prochain exercice, les scores et le
+classement, la vérification d'une réponse et la recherche d'utilisateurs
+sur un faux Drive. Les résultats JSON se comparent avec
+`python -m benchmarks.compare_runs`.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime
+
+import duckdb
+import numpy as np
+
+import dao
+from catalog import build_catalog
+from compare import compare_results
+from drive import MemoryDriveFile
+from executor import QueryExecutor, build_sandbox
+from init_db import init_db
+from passwords import PasswordHasher
+from reviews import (
+    apply_reviews,
+    ensure_review_state,
+    next_due_exercise,
+    record_reviews,
+)
+from scores import ensure_scores, load_leaderboard, record_attempt
+from sequencer import RandomStrategy, StoryStrategy
+from solutions import get_solution, parse_tables
+from user_store import JsonDriveUserStore
+from writer import DatabaseWriter
+from benchmarks.synthetic import (
+    AUTHORS,
+    DIFFICULTIES,
+    THEMES,
+    generate_exercises,
+    generate_tables,
+    generate_users,
+    write_csvs,
+)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE = "data/exercises_sql_tables.duckdb"
+
+
+def measure(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+    return {
+        "repeat": repeat,
+        "mean_ms": round(float(np.mean(durations)), 3),
+        "min_ms": round(min(durations), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+
+
+def run_init_db():
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db()
+
+
+def run_init_db_cold():
+    if os.path.exists(DATABASE):
+        os.remove(DATABASE)
+    run_init_db()
+
+
+def bench_init_db(results, args):
+    results["init_db.cold"] = measure(
+        run_init_db_cold, repeat=args.init_repeat, warmup=0
+    )
+    # Base à jour : seul le manifeste est comparé.
+    results["init_db.unchanged"] = measure(run_init_db, repeat=args.repeat)
+
+
+def bench_catalog(results, con, args, rng):
+    results["catalog.load"] = measure(
+        lambda: con.execute("SELECT * FROM memory_state").df(), repeat=args.repeat
+    )
+    results["catalog.facets"] = measure(
+        lambda: [dao.get_distinct(con, c) for c in ("theme", "author", "difficulty")],
+        repeat=args.repeat,
+    )
+    catalog = con.execute("SELECT * FROM memory_state").df()
+
+    def filter_catalog():
+        theme, author = rng.choice(THEMES), rng.choice(AUTHORS)
+        difficulty = rng.choice(DIFFICULTIES)
+        return catalog[
+            (catalog["theme"] == theme)
+            & (catalog["difficulty"] == difficulty)
+            & (catalog["author"] == author)
+        ]
+
+    results["catalog.filter"] = measure(filter_catalog, repeat=args.repeat)
+
+    snapshot = build_catalog(con)
+    results["catalog.snapshot_build"] = measure(
+        lambda: build_catalog(con), repeat=args.repeat
+    )
+
+    def filter_snapshot():
+        theme, author = rng.choice(THEMES), rng.choice(AUTHORS)
+        difficulty = rng.choice(DIFFICULTIES)
+        snapshot.counts("author", theme=theme)
+        snapshot.counts("difficulty", theme=theme, author=author)
+        return snapshot.filter(theme=theme, author=author, difficulty=difficulty)
+
+    results["catalog.snapshot_filter"] = measure(filter_snapshot, repeat=args.repeat)
+
+    # Tirage et parcours : structures préparées au premier appel par filtre,
+    # puis choix en temps constant.
+    random_strategy = RandomStrategy(snapshot, rng=rng)
+    story_strategy = StoryStrategy(snapshot)
+    results["sequencer.random_build"] = measure(
+        lambda: RandomStrategy(snapshot).table(theme=rng.choice(THEMES)),
+        repeat=args.repeat,
+    )
+    results["sequencer.random"] = measure(
+        lambda: random_strategy.select(None, None, {}, theme=rng.choice(THEMES)),
+        repeat=args.repeat,
+    )
+    state = {}
+    results["sequencer.story"] = measure(
+        lambda: story_strategy.select(None, None, state, theme=rng.choice(THEMES)),
+        repeat=args.repeat,
+    )
+
+
+def bench_next_due(results, con, args, rng, usernames, exercise_names):
+    ensure_review_state(con)
+    # Historique de révision : chaque utilisateur a noté une partie des exercices.
+    reviewed = min(args.reviews_per_user, len(exercise_names))
+    for username in usernames:
+        grades = {
+            name: rng.randint(1, 5) for name in rng.sample(exercise_names, reviewed)
+        }
+        record_reviews(con, username, grades, date(2024, 1, 1))
+
+    results["next_due.filtered"] = measure(
+        lambda: next_due_exercise(
+            con,
+            rng.choice(usernames),
+            rng.choice(THEMES),
+            rng.choice(AUTHORS),
+            rng.choice(DIFFICULTIES),
+        ),
+        repeat=args.repeat,
+    )
+    results["next_due.unfiltered"] = measure(
+        lambda: next_due_exercise(con, rng.choice(usernames)), repeat=args.repeat
+    )
+    results["review.record"] = measure(
+        lambda: record_reviews(
+            con, rng.choice(usernames), {rng.choice(exercise_names): 4}
+        ),
+        repeat=args.repeat,
+    )
+
+    # 100 notes soumises en même temps : regroupées en quelques transactions.
+    writer = DatabaseWriter(con)
+
+    def record_burst():
+        futures = [
+            writer.submit(
+                apply_reviews, rng.choice(usernames), {rng.choice(exercise_names): 4}
+            )
+            for _ in range(100)
+        ]
+        for future in futures:
+            future.result()
+
+    results["review.writer_burst_100"] = measure(record_burst, repeat=args.repeat)
+    writer.stop()
+
+
+def bench_scores(results, con, args, rng, usernames, exercise_names):
+    ensure_scores(con)
+    writer = DatabaseWriter(con)
+
+    def attempt():
+        return writer.submit(
+            record_attempt,
+            rng.choice(usernames),
+            rng.choice(exercise_names),
+            rng.random() < 0.5,
+            20,
+        )
+
+    # Historique : quelques tentatives par utilisateur avant les mesures.
+    for future in [attempt() for _ in range(args.reviews_per_user * len(usernames))]:
+        future.result()
+
+    results["scores.record"] = measure(lambda: attempt().result(), repeat=args.repeat)
+    writer.stop()
+    results["leaderboard.load"] = measure(
+        lambda: load_leaderboard(con), repeat=args.repeat
+    )
+    leaderboard = load_leaderboard(con)
+
+    def update_and_read():
+        leaderboard.update(rng.choice(usernames), rng.randrange(10**4), 1)
+        return leaderboard.top(10), leaderboard.rank(rng.choice(usernames))
+
+    results["leaderboard.update_top10"] = measure(update_and_read, repeat=args.repeat)
+
+
+def bench_solution_check(results, con, args, rng):
+    sandbox = os.path.abspath("data/sandbox.duckdb")
+    build_sandbox(con, sandbox)
+    executor = QueryExecutor(database=sandbox, timeout=60.0)
+    exercises = con.execute(
+        "SELECT exercise_name, answers, tables_used FROM memory_state"
+    ).fetchall()
+
+    def solution():
+        name, answer, tables_used = rng.choice(exercises)
+        return answer, get_solution(con, name, answer, tuple(parse_tables(tables_used)))
+
+    def check():
+        answer, expected = solution()
+        result = executor.execute(answer)
+        assert compare_results(result, expected).equal
+
+    results["solution.get"] = measure(solution, repeat=args.repeat)
+    results["solution.check"] = measure(check, repeat=args.repeat)
+
+
+def bench_auth(results, args, rng):
+    # Coût minimal : on mesure les recherches, pas le hachage
+    # (voir benchmarks/bench_passwords.py).
+    users = generate_users(args.users, PasswordHasher(scrypt_n=2**10), args.seed)
+    drive = MemoryDriveFile.with_users(users, latency=args.drive_latency)
+    store = JsonDriveUserStore(drive, ttl=3600, flush_delay=0.0)
+    usernames = list(users)
+
+    results["auth.load"] = measure(lambda: store.load(force=True), repeat=args.repeat)
+    results["auth.get"] = measure(
+        lambda: store.get(rng.choice(usernames)), repeat=args.repeat
+    )
+    results["auth.get_by_email"] = measure(
+        lambda: store.get_by_email(f"{rng.choice(usernames)}@example.com"),
+        repeat=args.repeat,
+    )
+
+    def put_and_flush():
+        username = rng.choice(usernames)
+        user = store.get(username)
+        user["last_login"] = rng.randrange(10**9)
+        store.put(username, user)
+        store.flush()
+
+    results["auth.put_flush"] = measure(put_and_flush, repeat=args.repeat)
+    return usernames
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--exercises", type=int, default=500)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--reviews-per-user", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--init-repeat", type=int, default=3)
+    parser.add_argument("--drive-latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fichier JSON (sortie standard par défaut)")
+    args = parser.parse_args()
+
+    os.environ["SQL_SRS_OFFLINE"] = "1"
+    output = os.path.abspath(args.output) if args.output else None
+    rng = random.Random(args.seed)
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix="sql_srs_bench_") as workdir:
+        tables_df = generate_tables(args.tables, args.rows, args.seed)
+        exercises_df = generate_exercises(args.exercises, tables_df, args.seed)
+        write_csvs(workdir, exercises_df, tables_df)
+
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            bench_init_db(results, args)
+            usernames = bench_auth(results, args, rng)
+
+            con = duckdb.connect(DATABASE)
+            exercise_names = list(exercises_df["exercise_name"])
+            bench_catalog(results, con, args, rng)
+            bench_next_due(results, con, args, rng, usernames, exercise_names)
+            bench_scores(results, con, args, rng, usernames, exercise_names)
+            bench_solution_check(results, con, args, rng)
+            con.close()
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "machine": platform.machine(),
+            "params": {
+                key: value for key, value in vars(args).items() if key != "output"
+            },
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
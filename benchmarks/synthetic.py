@@ -0,0 +1,100 @@
+"""Données synthétiques pour les benchmarks : tables, exercices, utilisateurs."""
+
+import os
+import random
+
+import pandas as pd
+
+THEMES = ["select", "joins", "group_by", "window_functions", "cte", "cross_joins"]
+AUTHORS = ["julien", "alice", "bob"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+CATEGORIES = ["a", "b", "c", "d", "e"]
+
+TABLE_COLUMNS = "id,label,amount,category"
+TABLE_TYPES = "int,str,float,str"
+
+ANSWERS = [
+    "SELECT * FROM {table} ORDER BY id",
+    "SELECT category, count(*) AS n, sum(amount) AS total FROM {table} GROUP BY category",
+    "SELECT id, amount, sum(amount) OVER (ORDER BY id) AS running FROM {table} ORDER BY id",
+    "SELECT a.category, count(*) AS n FROM {table} a JOIN {other} b ON a.id = b.id "
+    "GROUP BY a.category",
+]
+
+
+def generate_tables(n_tables, rows, seed=0):
+    """Lignes de tables.csv : valeurs séparées par ":" et lignes par ","."""
+    rng = random.Random(seed)
+    records = []
+    for t in range(n_tables):
+        data = ",".join(
+            f"{i}:label_{rng.randrange(10**6)}:{rng.uniform(0, 100):.2f}:"
+            f"{rng.choice(CATEGORIES)}"
+            for i in range(rows)
+        )
+        records.append(
+            {
+                "tables": f"table_{t}",
+                "columns": TABLE_COLUMNS,
+                "types": TABLE_TYPES,
+                "data": data,
+            }
+        )
+    return pd.DataFrame(records)
+
+
+def generate_exercises(n_exercises, tables_df, seed=0):
+    """Exercices répartis sur les thèmes, auteurs et difficultés."""
+    rng = random.Random(seed)
+    tables = list(tables_df["tables"])
+    records = []
+    for e in range(n_exercises):
+        table, other = rng.choice(tables), rng.choice(tables)
+        template = rng.choice(ANSWERS)
+        answer = template.format(table=table, other=other)
+        tables_used = f"{table},{other}" if "{other}" in template else table
+        records.append(
+            {
+                "exercise_name": f"exercise_{e}",
+                "theme": rng.choice(THEMES),
+                "tables_used": tables_used,
+                "last_reviewed": "1970-01-01",
+                "question": f"Question synthétique {e}",
+                "difficulty": rng.choice(DIFFICULTIES),
+                "tables": tables_used,
+                "answers": answer,
+                "author": rng.choice(AUTHORS),
+            }
+        )
+    return pd.DataFrame(records)
+
+
+def write_csvs(directory, exercises_df, tables_df):
+    """Écrit data/exercises.csv et data/tables.csv au format attendu par init_db."""
+    data_dir = os.path.join(directory, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    exercises_df.to_csv(
+        os.path.join(data_dir, "exercises.csv"),
+        sep=";",
+        index=False,
+        encoding="latin-1",
+    )
+    tables_df.to_csv(
+        os.path.join(data_dir, "tables.csv"), sep=";", index=False, encoding="latin-1"
+    )
+
+
+def generate_users(n_users, hasher, seed=0):
+    """Utilisateurs au format de users.json ; le mot de passe est le nom."""
+    rng = random.Random(seed)
+    # Hacher chaque utilisateur au coût réel prendrait des minutes : les
+    # utilisateurs partagent un petit nombre de hachages.
+    hashes = [hasher.hash(f"user_{i}") for i in range(min(n_users, 8))]
+    return {
+        f"user_{i}": {
+            "password": hashes[i % len(hashes)],
+            "email": f"user_{i}@example.com",
+            "last_login": rng.randrange(10**9),
+        }
+        for i in range(n_users)
+    }
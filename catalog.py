@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pyarrow as pa
+
+from dao import table_exists
+from solutions import content_hash
+
+FACETS = ("theme", "author", "difficulty")
+SELECT_CATALOG = "SELECT * FROM memory_state ORDER BY exercise_name"
+SELECT_MANIFEST = """
+    SELECT kind || ':' || name, content_hash FROM build_manifest
+    ORDER BY kind, name
+"""
+
+
+@dataclass(frozen=True)
+class Facet:
+    # Valeurs distinctes triées ; codes[i] est l'indice de la valeur de la
+    # ligne i (-1 si NULL) ; rows[value] donne les lignes triées de la valeur.
+    values: list
+    codes: np.ndarray
+    rows: dict
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Catalogue figé : table Arrow et index par facette.
+
+    Un filtre ne parcourt que les lignes des valeurs choisies (intersection
+    des index), jamais le catalogue entier. L'instantané est immuable et
+    partagé entre les sessions ; il est reconstruit quand le contenu change.
+    """
+
+    version: str
+    table: pa.Table
+    facets: dict
+
+    def rows(self, **filters):
+        """Positions des lignes qui correspondent aux filtres (None = tous)."""
+        selected = [
+            self.facets[column].rows.get(value, np.empty(0, dtype=np.int64))
+            for column, value in filters.items()
+            if value is not None
+        ]
+        if not selected:
+            return np.arange(self.table.num_rows)
+        selected.sort(key=len)
+        result = selected[0]
+        for rows in selected[1:]:
+            result = np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def filter(self, **filters):
+        return self.table.take(self.rows(**filters)).to_pandas()
+
+    def counts(self, column, **filters):
+        """Nombre d'exercices par valeur de `column`, sous les autres filtres."""
+        facet = self.facets[column]
+        codes = facet.codes[self.rows(**filters)]
+        counts = np.bincount(codes[codes >= 0], minlength=len(facet.values))
+        return dict(zip(facet.values, counts.tolist()))
+
+
+def _build_facet(column):
+    encoded = column.combine_chunks().dictionary_encode()
+    dictionary = encoded.dictionary.to_pylist()
+    order = sorted(range(len(dictionary)), key=lambda i: str(dictionary[i]))
+    remap = np.empty(len(dictionary), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+
+    indices = encoded.indices.to_numpy(zero_copy_only=False)
+    codes = np.full(len(encoded), -1, dtype=np.int64)
+    valid = encoded.indices.is_valid().to_numpy(zero_copy_only=False)
+    codes[valid] = remap[indices[valid].astype(np.int64)]
+
+    values = [dictionary[i] for i in order]
+    positions = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[positions], np.arange(len(values) + 1))
+    rows = {
+        value: positions[bounds[i] : bounds[i + 1]] for i, value in enumerate(values)
+    }
+    for array in (codes, *rows.values()):
+        array.setflags(write=False)
+    return Facet(values, codes, rows)
+
+
+def catalog_version(con):
+    """Empreinte des exercices et des tables, tirée du manifeste de init_db."""
+    if table_exists(con, "build_manifest"):
+        manifest = con.execute(SELECT_MANIFEST).fetchall()
+        return content_hash(*(f"{name}:{value}" for name, value in manifest))
+    return content_hash(
+        con.execute("SELECT sum(hash(m)) FROM memory_state m").fetchone()[0]
+    )
+
+
+def build_catalog(con):
+    table = con.execute(SELECT_CATALOG).arrow()
+    facets = {column: _build_facet(table[column]) for column in FACETS}
+    return CatalogSnapshot(catalog_version(con), table, facets)
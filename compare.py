@@ -0,0 +1,156 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 65536
+MAX_REPORTED_ROWS = 20
+
+
+@dataclass
+class Comparison:
+    equal: bool
+    reason: str = ""
+    # Positions (dans le résultat de l'apprenant) des lignes qui diffèrent.
+    result_rows: list = field(default_factory=list)
+    # Positions (dans la solution) des lignes manquantes ou différentes.
+    expected_rows: list = field(default_factory=list)
+
+
+def _normalize_column(column):
+    if pd.api.types.is_bool_dtype(column):
+        return column.astype("float64")
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column.astype("int64")
+    if pd.api.types.is_object_dtype(column) and pd.api.types.infer_dtype(
+        column, skipna=True
+    ) in ("decimal", "integer", "floating", "mixed-integer-float"):
+        column = pd.to_numeric(column, errors="coerce")
+    if pd.api.types.is_numeric_dtype(column):
+        return column.astype("float64")
+    return column.astype("string").fillna("<NA>")
+
+
+def normalize(df):
+    """Colonnes renommées par position et types ramenés à float/str/int64."""
+    return pd.DataFrame(
+        {
+            i: _normalize_column(df.iloc[:, i].reset_index(drop=True))
+            for i in range(df.shape[1])
+        }
+    )
+
+
+def row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _split(result, expected):
+    """Sépare les colonnes numériques des deux côtés (comparées avec
+    tolérance) des autres (comparées par hachage)."""
+    numeric = [
+        i
+        for i in range(result.shape[1])
+        if result[i].dtype == "float64" and expected[i].dtype == "float64"
+    ]
+
+    def parts(df):
+        keys = df.drop(columns=numeric)
+        hashes = row_hashes(keys) if keys.shape[1] else np.zeros(len(df), np.uint64)
+        return hashes, df[numeric].to_numpy()
+
+    return parts(result), parts(expected)
+
+
+def _close(result_values, expected_values, float_tolerance):
+    # Deux NaN (NULL) sont égaux ; sans tolérance, égalité exacte.
+    return np.isclose(
+        result_values,
+        expected_values,
+        rtol=0,
+        atol=float_tolerance or 0,
+        equal_nan=True,
+    ).all(axis=1)
+
+
+def _compare_ordered(result, expected, float_tolerance):
+    (result_hashes, result_values), (expected_hashes, expected_values) = _split(
+        result, expected
+    )
+    for start in range(0, len(result), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        differs = (result_hashes[chunk] != expected_hashes[chunk]) | ~_close(
+            result_values[chunk], expected_values[chunk], float_tolerance
+        )
+        if differs.any():
+            # Arrêt au premier bloc en écart.
+            rows = (np.flatnonzero(differs)[:MAX_REPORTED_ROWS] + start).tolist()
+            return Comparison(False, "Le contenu est incorrect", rows, rows)
+    return Comparison(True)
+
+
+def _sorted_rows(hashes, values):
+    # np.lexsort trie sur la dernière clé d'abord : hachage, puis colonnes
+    # numériques dans l'ordre.
+    return np.lexsort((*values.T[::-1], hashes))
+
+
+def _compare_unordered(result, expected, float_tolerance):
+    result_hashes = row_hashes(result)
+    expected_hashes = row_hashes(expected)
+    if np.array_equal(np.sort(result_hashes), np.sort(expected_hashes)):
+        return Comparison(True)
+
+    # Égalité à la tolérance près : les deux côtés sont triés (colonnes non
+    # numériques, puis valeurs numériques) et comparés ligne à ligne.
+    (result_keys, result_values), (expected_keys, expected_values) = _split(
+        result, expected
+    )
+    if result_values.shape[1]:
+        result_order = _sorted_rows(result_keys, result_values)
+        expected_order = _sorted_rows(expected_keys, expected_values)
+        if (
+            np.array_equal(result_keys[result_order], expected_keys[expected_order])
+            and _close(
+                result_values[result_order],
+                expected_values[expected_order],
+                float_tolerance,
+            ).all()
+        ):
+            return Comparison(True)
+
+    # Comparaison des multi-ensembles : une ligne en double compte deux fois.
+    result_counts = pd.Series(result_hashes).value_counts()
+    expected_counts = pd.Series(expected_hashes).value_counts()
+    surplus = result_counts.sub(expected_counts, fill_value=0)
+    extra = surplus[surplus > 0].index
+    missing = surplus[surplus < 0].index
+    result_rows = np.flatnonzero(np.isin(result_hashes, extra))
+    expected_rows = np.flatnonzero(np.isin(expected_hashes, missing))
+    return Comparison(
+        False,
+        "Le contenu est incorrect",
+        result_rows[:MAX_REPORTED_ROWS].tolist(),
+        expected_rows[:MAX_REPORTED_ROWS].tolist(),
+    )
+
+
+def compare_results(result, expected, ordered=True, float_tolerance=1e-9):
+    """Compare deux résultats de requête par hachage vectorisé des lignes.
+
+    Les noms de colonnes sont ignorés (comparaison par position). Les
+    colonnes numériques sont égales à float_tolerance près (écart absolu).
+    Avec ordered=False, les lignes sont comparées comme des multi-ensembles ;
+    à tolérance près, l'appariement se fait après tri, ce qui suppose que
+    deux lignes proches ne s'intercalent pas avec une troisième.
+    """
+    if result.shape[0] != expected.shape[0]:
+        return Comparison(False, "Le nombre de lignes est incorrect")
+    if result.shape[1] != expected.shape[1]:
+        return Comparison(False, "Le nombre de colonnes est incorrect")
+
+    result = normalize(result)
+    expected = normalize(expected)
+    if ordered:
+        return _compare_ordered(result, expected, float_tolerance)
+    return _compare_unordered(result, expected, float_tolerance)
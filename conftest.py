@@ -0,0 +1,2 @@
+# test_db.py est un script d'inspection de la base, pas un test.
+collect_ignore = ["test_db.py"]
@@ -0,0 +1,61 @@
+import duckdb
+
+# Requêtes paramétrées : aucune valeur fournie par l'utilisateur ou issue du
+# contenu (nom d'exercice, thème...) n'est interpolée dans le SQL.
+SELECT_ANSWER = "SELECT answers FROM memory_state WHERE exercise_name = ?"
+SELECT_TABLE_EXISTS = """
+    SELECT count(*) FROM duckdb_tables()
+    WHERE table_name = ? AND schema_name = 'main'
+"""
+SELECT_COLUMNS = """
+    SELECT column_name, data_type FROM information_schema.columns
+    WHERE table_name = ? AND table_schema = 'main'
+    ORDER BY ordinal_position
+"""
+
+# Seules ces colonnes peuvent servir de filtre dans la barre latérale.
+FACET_COLUMNS = ("theme", "author", "difficulty")
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_answer(con, exercise_name):
+    row = con.execute(SELECT_ANSWER, [exercise_name]).fetchone()
+    return row[0] if row is not None else None
+
+
+def get_distinct(con, column):
+    if column not in FACET_COLUMNS:
+        raise ValueError(f"Colonne de filtre inconnue : {column}")
+    rows = con.execute(f"SELECT DISTINCT {column} FROM memory_state").fetchall()
+    return [value for (value,) in rows]
+
+
+def table_exists(con, table):
+    return con.execute(SELECT_TABLE_EXISTS, [table]).fetchone()[0] > 0
+
+
+def _check_table(con, table):
+    if not table_exists(con, table):
+        raise duckdb.CatalogException(f"La table {table} n'existe pas.")
+
+
+def get_table_summary(con, table):
+    """Nombre de lignes et schéma (colonne, type) d'une table."""
+    _check_table(con, table)
+    row_count = con.execute(
+        f"SELECT count(*) FROM {quote_identifier(table)}"
+    ).fetchone()[0]
+    columns = con.execute(SELECT_COLUMNS, [table]).fetchall()
+    return row_count, columns
+
+
+def fetch_table_page(con, table, page, page_size):
+    """Lignes de la page `page` (à partir de 0), sans charger la table entière."""
+    _check_table(con, table)
+    return con.execute(
+        f"SELECT * FROM {quote_identifier(table)} LIMIT ? OFFSET ?",
+        [page_size, page * page_size],
+    ).df()
@@ -0,0 +1,165 @@
+import logging
+import os
+import threading
+
+import duckdb
+import streamlit as st
+
+import dao
+from artifact import fetch_database_artifact
+from catalog import build_catalog
+from executor import QueryExecutor, build_sandbox
+from init_db import database_lock, init_db
+from reviews import ensure_review_state
+from scores import ensure_scores, load_leaderboard
+from sequencer import Sequencer
+from sessions import ensure_revocations, load_revocations, tokens_from_env
+from solutions import tables_fingerprint
+from writer import DatabaseWriter
+
+DATA_DIR = "data"
+DATABASE = "data/exercises_sql_tables.duckdb"
+CONTENT_FILES = ("data/exercises.csv", "data/tables.csv")
+
+# Fichier de base prêt : levé une seule fois par processus.
+_database_ready = threading.Event()
+_prepare_lock = threading.Lock()
+
+
+def database_ready():
+    return _database_ready.is_set()
+
+
+def prepare_database():
+    """Prépare le fichier de base, une seule fois par processus.
+
+    Les sessions qui arrivent pendant la préparation attendent la première
+    au lieu de la refaire ; les autres processus attendent le verrou fichier.
+    """
+    if _database_ready.is_set():
+        return
+    with _prepare_lock:
+        if _database_ready.is_set():
+            return
+        if DATA_DIR not in os.listdir():
+            logging.error(os.listdir())
+            logging.error("Creating folder: data")
+            os.mkdir(DATA_DIR)
+
+        with database_lock(DATABASE):
+            # Conteneur vierge : la base pré-construite évite téléchargements
+            # et parsing.
+            fetch_database_artifact(DATABASE)
+
+            # Reconstruction incrémentale : seuls les exercices et tables
+            # modifiés depuis le dernier démarrage sont rechargés. Sans les
+            # CSV, une base existante (pré-construite ou non) est utilisée
+            # telle quelle.
+            if not os.path.exists(DATABASE) or all(map(os.path.exists, CONTENT_FILES)):
+                init_db(DATABASE, lock=False)
+        _database_ready.set()
+
+
+@st.cache_resource
+def get_connection():
+    """Connexion DuckDB unique, partagée par toutes les sessions du processus."""
+    prepare_database()
+    con = duckdb.connect(database=DATABASE, read_only=False)
+    ensure_review_state(con)
+    ensure_scores(con)
+    ensure_revocations(con)
+    return con
+
+
+@st.cache_resource
+def get_query_executor():
+    """Pool partagé qui exécute les requêtes des apprenants hors connexion principale."""
+    build_sandbox(get_connection())
+    return QueryExecutor()
+
+
+@st.cache_resource
+def get_writer():
+    """Écrivain unique : les sessions lui confient leurs modifications."""
+    return DatabaseWriter(get_connection())
+
+
+@st.cache_resource
+def get_leaderboard():
+    """Classement partagé, mis à jour par chaque tentative enregistrée."""
+    return load_leaderboard(get_connection().cursor())
+
+
+@st.cache_resource
+def get_session_tokens():
+    """Jetons de session, avec la liste de révocation chargée une fois."""
+    return tokens_from_env(load_revocations(get_connection().cursor()))
+
+
+def refresh_sandbox():
+    """À appeler après une modification des tables d'exercices."""
+    build_sandbox(get_connection())
+    get_query_executor().refresh()
+
+
+def get_cursor():
+    """Curseur propre à la session Streamlit, créé sur la connexion partagée."""
+    if "db_cursor" not in st.session_state:
+        st.session_state["db_cursor"] = get_connection().cursor()
+    return st.session_state["db_cursor"]
+
+
+# -----------------------------------------------------------------------------------
+# MÉTADONNÉES EN CACHE (invalidées par invalidate_cache après chaque écriture)
+# -----------------------------------------------------------------------------------
+@st.cache_resource
+def get_catalog_snapshot():
+    """Instantané partagé (non copié) du catalogue ; voir catalog.py."""
+    return build_catalog(get_connection().cursor())
+
+
+@st.cache_resource
+def get_sequencer():
+    """Stratégies de choix d'exercice, préparées pour l'instantané courant."""
+    return Sequencer(get_catalog_snapshot())
+
+
+def get_themes():
+    return get_catalog_snapshot().facets["theme"].values
+
+
+def get_authors():
+    return get_catalog_snapshot().facets["author"].values
+
+
+def get_difficulties():
+    return [str(value) for value in get_catalog_snapshot().facets["difficulty"].values]
+
+
+@st.cache_data
+def get_table_summary(table):
+    return dao.get_table_summary(get_connection().cursor(), table)
+
+
+@st.cache_data(max_entries=256)
+def get_table_page(table, page, page_size):
+    return dao.fetch_table_page(get_connection().cursor(), table, page, page_size)
+
+
+@st.cache_data
+def get_tables_fingerprint(tables):
+    return tables_fingerprint(get_connection().cursor(), tables)
+
+
+def invalidate_cache():
+    get_catalog_snapshot.clear()
+    get_sequencer.clear()
+
+
+def invalidate_content():
+    """À appeler après une modification des exercices ou de leurs tables."""
+    get_tables_fingerprint.clear()
+    get_table_summary.clear()
+    get_table_page.clear()
+    invalidate_cache()
+    refresh_sandbox()
@@ -0,0 +1,170 @@
+import hashlib
+import io
+import json
+import os
+import threading
+
+from filelock import FileLock
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseUpload
+
+API_NAME = "drive"
+API_VERSION = "v3"
+SCOPES = ["https://www.googleapis.com/auth/drive"]
+
+
+class VersionConflict(Exception):
+    """Le fichier distant a changé depuis la version attendue."""
+
+    def __init__(self, version):
+        super().__init__(f"Version distante {version} inattendue.")
+        self.version = version
+
+
+def is_offline():
+    """SQL_SRS_OFFLINE=1 : aucun appel réseau, remplaçants locaux partout."""
+    return os.environ.get("SQL_SRS_OFFLINE") == "1"
+
+
+class DriveFile:
+    """Fichier stocké sur Google Drive, accédé via un service API unique.
+
+    Le client googleapiclient n'est pas thread-safe : toutes les requêtes
+    passent par un verrou, ce qui permet de partager l'instance entre les
+    sessions Streamlit et le thread d'écriture en arrière-plan.
+    """
+
+    def __init__(self, file_id, service_account_info):
+        self.file_id = file_id
+        self._service_account_info = service_account_info
+        self._service = None
+        self._lock = threading.Lock()
+
+    def _get_service(self):
+        if self._service is None:
+            credentials = service_account.Credentials.from_service_account_info(
+                self._service_account_info, scopes=SCOPES
+            )
+            self._service = build(
+                API_NAME, API_VERSION, credentials=credentials, cache_discovery=False
+            )
+        return self._service
+
+    def version(self):
+        with self._lock:
+            metadata = (
+                self._get_service()
+                .files()
+                .get(fileId=self.file_id, fields="version")
+                .execute()
+            )
+        return metadata["version"]
+
+    def download(self):
+        with self._lock:
+            files = self._get_service().files()
+            metadata = files.get(fileId=self.file_id, fields="version").execute()
+            content = files.get_media(fileId=self.file_id).execute()
+        return content, metadata["version"]
+
+    def upload(self, content, expected_version=None):
+        """Remplace le contenu ; VersionConflict si la version a changé.
+
+        Drive v3 n'offre pas d'écriture conditionnelle : la version est
+        vérifiée juste avant l'envoi, sous le verrou du processus.
+        """
+        media = MediaIoBaseUpload(io.BytesIO(content), mimetype="application/json")
+        with self._lock:
+            files = self._get_service().files()
+            if expected_version is not None:
+                current = files.get(fileId=self.file_id, fields="version").execute()
+                if current["version"] != expected_version:
+                    raise VersionConflict(current["version"])
+            metadata = files.update(
+                fileId=self.file_id, media_body=media, fields="version"
+            ).execute()
+        return metadata["version"]
+
+
+class LocalDriveFile:
+    """Remplaçant local de DriveFile (tests, développement hors ligne).
+
+    La version du fichier est l'empreinte de son contenu, ce qui reproduit
+    le champ `version` de Drive qui change à chaque mise à jour (la date de
+    modification est trop grossière sur certains systèmes de fichiers). Un
+    verrou de fichier rend la vérification de version atomique entre
+    processus.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = FileLock(f"{path}.lock")
+
+    def version(self):
+        try:
+            with open(self.path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    def download(self):
+        with self._lock:
+            try:
+                with open(self.path, "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                return b"", None
+            return content, hashlib.sha256(content).hexdigest()
+
+    def upload(self, content, expected_version=None):
+        with self._lock:
+            current = self.version()
+            if expected_version is not None and current != expected_version:
+                raise VersionConflict(current)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+            return hashlib.sha256(content).hexdigest()
+
+
+class MemoryDriveFile:
+    """DriveFile en mémoire (tests, benchmarks), avec une latence simulée."""
+
+    def __init__(self, content=b"", latency=0.0):
+        self.content = content
+        self.latency = latency
+        self.uploads = 0
+        self._version = 1
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            threading.Event().wait(self.latency)
+
+    def version(self):
+        self._wait()
+        return str(self._version)
+
+    def download(self):
+        self._wait()
+        with self._lock:
+            return self.content, str(self._version)
+
+    def upload(self, content, expected_version=None):
+        self._wait()
+        with self._lock:
+            if expected_version is not None and expected_version != str(self._version):
+                raise VersionConflict(str(self._version))
+            self.content = content
+            self._version += 1
+            self.uploads += 1
+            return str(self._version)
+
+    @classmethod
+    def with_users(cls, users, latency=0.0):
+        return cls(json.dumps(users).encode(), latency)
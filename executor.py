@@ -0,0 +1,193 @@
+import math
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import duckdb
+
+from dao import quote_identifier, table_exists
+from tracing import span
+
+SANDBOX_DATABASE = "data/sandbox.duckdb"
+# Seules les tables d'exercices, inscrites au manifeste de construction sous
+# ces kinds, sont copiées : une nouvelle table de l'application (scores,
+# sessions...) n'est jamais exposée par défaut.
+SANDBOX_KINDS = ["table", "authored_table"]
+SELECT_SANDBOX_TABLES = """
+    SELECT DISTINCT t.table_name FROM duckdb_tables() t
+    JOIN build_manifest m ON m.name = t.table_name AND list_contains(?, m.kind)
+    WHERE t.database_name = ? AND t.schema_name = 'main'
+"""
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class ResultTooLarge(Exception):
+    pass
+
+
+def check_select(con, query):
+    """Refuse tout ce qui n'est pas une requête SELECT unique."""
+    statements = con.extract_statements(query)
+    if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+        raise duckdb.InvalidInputException(
+            "Seule une requête SELECT unique est acceptée."
+        )
+
+
+def build_sandbox(con, path=SANDBOX_DATABASE):
+    """Copie les tables d'exercices dans une base dédiée aux requêtes utilisateur.
+
+    Les connexions du pool ouvrent cette copie en lecture seule : elles ne
+    partagent jamais le fichier de la connexion principale en écriture.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    cursor = con.cursor()
+    database = cursor.execute("SELECT current_database()").fetchone()[0]
+    tables = []
+    if table_exists(cursor, "build_manifest"):
+        tables = cursor.execute(
+            SELECT_SANDBOX_TABLES, [SANDBOX_KINDS, database]
+        ).fetchall()
+
+    cursor.execute(f"ATTACH '{tmp_path}' AS sandbox_build")
+    try:
+        for (table,) in tables:
+            cursor.execute(
+                f"CREATE TABLE sandbox_build.{quote_identifier(table)} AS "
+                f"SELECT * FROM {quote_identifier(database)}.{quote_identifier(table)}"
+            )
+    finally:
+        cursor.execute("DETACH sandbox_build")
+    os.replace(tmp_path, path)
+
+
+class QueryRun:
+    """Exécution en cours d'une requête, annulable depuis la session."""
+
+    def __init__(self, executor):
+        self._executor = executor
+        self.connection = None
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        self.cancelled = True
+        self.future.cancel()
+        if self.connection is not None:
+            self.connection.interrupt()
+
+    def result(self, timeout=None):
+        timeout = self._executor.timeout if timeout is None else timeout
+        try:
+            return self.future.result(timeout=timeout)
+        except TimeoutError:
+            self.cancel()
+            raise QueryTimeout(
+                f"La requête a dépassé la limite de {timeout:g} secondes."
+            ) from None
+
+
+class QueryExecutor:
+    """Pool de connexions DuckDB en lecture seule pour les requêtes des apprenants.
+
+    Chaque connexion est une base en mémoire qui attache la copie sandbox en
+    READ_ONLY, avec l'accès aux fichiers désactivé et une configuration
+    verrouillée (mémoire, threads). Une requête lente n'occupe qu'une
+    connexion du pool et peut être interrompue.
+    """
+
+    def __init__(
+        self,
+        database=SANDBOX_DATABASE,
+        pool_size=4,
+        timeout=5.0,
+        memory_limit="256MB",
+        threads=1,
+        max_rows=10000,
+    ):
+        self.database = database
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.threads = threads
+        self.max_rows = max_rows
+
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._connections = queue.Queue()
+        for _ in range(pool_size):
+            self._connections.put(self._connect())
+        self._workers = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="user-query"
+        )
+
+    def _connect(self):
+        con = duckdb.connect(database=":memory:")
+        con.execute(f"ATTACH '{self.database}' AS exercises (READ_ONLY)")
+        con.execute("USE exercises")
+        con.execute(f"SET memory_limit = '{self.memory_limit}'")
+        con.execute(f"SET threads = {int(self.threads)}")
+        con.execute("SET enable_external_access = false")
+        con.execute("SET lock_configuration = true")
+        return con, self._generation
+
+    def refresh(self):
+        """Rouvre les connexions après une reconstruction de la sandbox."""
+        with self._lock:
+            self._generation += 1
+
+    def _acquire(self):
+        con, generation = self._connections.get()
+        if generation != self._generation:
+            con.close()
+            con, generation = self._connect()
+        return con, generation
+
+    def _run(self, run, query, max_rows):
+        # Attente d'une connexion libre : mesure la contention sur le pool.
+        with span("executor.acquire"):
+            con, generation = self._acquire()
+        run.connection = con
+        try:
+            if run.cancelled:
+                raise duckdb.InterruptException("Requête annulée.")
+            # USE, ATTACH ou CREATE sur la base en mémoire survivraient à la
+            # requête et seraient vus par l'apprenant suivant.
+            check_select(con, query)
+            cursor = con.execute(query)
+            if cursor.description is None:
+                raise duckdb.InvalidInputException(
+                    "La requête ne renvoie aucun résultat."
+                )
+            vectors = math.ceil((max_rows + 1) / duckdb.__standard_vector_size__)
+            result = cursor.fetch_df_chunk(vectors)
+            if len(result) > max_rows:
+                raise ResultTooLarge(
+                    f"Le résultat dépasse la limite de {max_rows} lignes."
+                )
+            return result
+        finally:
+            run.connection = None
+            try:
+                con.execute("USE exercises")
+            except duckdb.Error:
+                # Connexion inutilisable : remplacée au prochain emprunt.
+                generation = None
+            self._connections.put((con, generation))
+
+    def submit(self, query, max_rows=None):
+        run = QueryRun(self)
+        max_rows = self.max_rows if max_rows is None else max_rows
+        run.future = self._workers.submit(self._run, run, query, max_rows)
+        return run
+
+    def execute(self, query, timeout=None, max_rows=None):
+        """Résultat de la requête ; max_rows remplace la limite par défaut."""
+        return self.submit(query, max_rows).result(timeout=timeout)
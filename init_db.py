@@ -1,9 +1,14 @@
+import contextlib
 import duckdb
 import pandas as pd
 import os
 import gdown
+from concurrent.futures import ThreadPoolExecutor
+from filelock import FileLock
+from drive import is_offline
+from solutions import content_hash, parse_tables, precompute_solutions
 
-con = duckdb.connect(database="data/exercises_sql_tables.duckdb", read_only=False)
+DATABASE = "data/exercises_sql_tables.duckdb"
 
 EXERCISES_FILE_ID = "1NM1Q5iF7UsEtR1I2V3r6MgXqQpgG9T9f"
 TABLES_FILE_ID = "1PsMtuAVsX0b-0TtNaDC1MvirkPKrQNr0"
@@ -12,79 +17,290 @@ TABLES_FILE_ID = "1PsMtuAVsX0b-0TtNaDC1MvirkPKrQNr0"
 EXERCISES_FILE = "data/exercises.csv"
 TABLES_FILE = "data/tables.csv"
 
-if not os.path.exists(EXERCISES_FILE):
-    gdown.download(f"https://drive.google.com/uc?id={EXERCISES_FILE_ID}", EXERCISES_FILE, quiet=False)
 
-if not os.path.exists(TABLES_FILE):
-    gdown.download(f"https://drive.google.com/uc?id={TABLES_FILE_ID}", TABLES_FILE, quiet=False)
+def download(file_id, path):
+    gdown.download(f"https://drive.google.com/uc?id={file_id}", path, quiet=False)
+
+
+def download_missing_files():
+    # Les deux CSV sont téléchargés en parallèle ; hors ligne, ils doivent déjà
+    # être présents dans data/.
+    missing_files = [
+        (file_id, path)
+        for file_id, path in [
+            (EXERCISES_FILE_ID, EXERCISES_FILE),
+            (TABLES_FILE_ID, TABLES_FILE),
+        ]
+        if not os.path.exists(path)
+    ]
+    if missing_files and not is_offline():
+        with ThreadPoolExecutor(max_workers=len(missing_files)) as pool:
+            list(pool.map(lambda args: download(*args), missing_files))
+
 
 # -----------------------------------------------------------------------------------
 # FONCTION DE CONVERSION
 # -----------------------------------------------------------------------------------
-def convert_value(value, dtype):
-    if dtype == "int":
-        return int(value)
-    elif dtype == "float":
-        return float(value)
-    elif dtype == "str":
-        return value
-    else:
-        raise ValueError(f"Type non supporté : {dtype}")
+SQL_TYPES = {"int": "BIGINT", "float": "DOUBLE", "str": "VARCHAR"}
 
 
-# -----------------------------------------------------------------------------------
-# CHARGEMENT DES EXERCICES
-# -----------------------------------------------------------------------------------
+def convert_type(dtype):
+    try:
+        return SQL_TYPES[dtype.strip()]
+    except KeyError:
+        raise ValueError(f"Type non supporté : {dtype}") from None
+
 
-exercises_csv = "data/exercises.csv"
-exercises_df = pd.read_csv(exercises_csv, delimiter=";", encoding="latin-1")
+def table_select(columns, types, source, row_id):
+    """SELECT qui décode une ligne de tables.csv entièrement dans DuckDB.
 
-con.execute(
+    `data` contient des lignes séparées par "," et des valeurs séparées par
+    ":" ; string_split/unnest évitent la conversion cellule par cellule.
     """
-    CREATE OR REPLACE TABLE memory_state AS 
-    SELECT exercise_name, theme, tables_used, last_reviewed, question, difficulty, tables, answers, author
-    FROM exercises_df
-"""
-)
+    casts = ", ".join(
+        f'CAST(parts[{i}] AS {convert_type(dtype)}) AS "{column.strip()}"'
+        for i, (column, dtype) in enumerate(zip(columns, types), start=1)
+    )
+    return f"""
+        SELECT {casts}
+        FROM (
+            SELECT string_split(unnest(string_split(data, ',')), ':') AS parts
+            FROM {source} WHERE row_id = {int(row_id)}
+        )
+    """
+
+
+def create_tables(con, tables_df):
+    tables_source = tables_df.reset_index(drop=True)
+    tables_source["row_id"] = tables_source.index
+    con.register("tables_source", tables_source)
+    try:
+        for row in tables_source.itertuples(index=False):
+            select = table_select(
+                row.columns.split(","),
+                row.types.split(","),
+                "tables_source",
+                row.row_id,
+            )
+            con.execute(f'CREATE OR REPLACE TABLE "{row.tables}" AS {select}')
+            print(f"Table {row.tables} créée ou mise à jour avec succès.")
+    finally:
+        con.unregister("tables_source")
+
+
+def load_tables(con, tables_df):
+    """Crée toutes les tables de tables.csv dans une seule transaction."""
+    con.execute("BEGIN TRANSACTION")
+    try:
+        create_tables(con, tables_df)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
 
-print("Table memory_state créée avec succès.")
-exercises_df = con.execute("SELECT * FROM memory_state").fetchdf()
-print(exercises_df)
 
 # -----------------------------------------------------------------------------------
-# CHARGEMENT DES TABLES
+# MANIFESTE DE CONSTRUCTION
 # -----------------------------------------------------------------------------------
+EXERCISE_COLUMNS = [
+    "exercise_name",
+    "theme",
+    "tables_used",
+    "last_reviewed",
+    "question",
+    "difficulty",
+    "tables",
+    "answers",
+    "author",
+]
+TABLE_COLUMNS = ["tables", "columns", "types", "data"]
 
-tables_csv = "data/tables.csv"
-tables_df = pd.read_csv(tables_csv, delimiter=";", encoding="latin-1")
 
+def row_hashes(df, columns):
+    return [content_hash(*row) for row in df[columns].itertuples(index=False)]
 
-for index, row in tables_df.iterrows():
-    table_name = row["tables"]
-    columns = row["columns"]
-    data = row["data"]
-    types = row["types"].split(",")
 
-    data_list = [
-        dict(
-            zip(
-                columns.split(","),
-                [
-                    convert_value(value, dtype)
-                    for value, dtype in zip(item.split(":"), types)
-                ],
-            )
+def ensure_manifest(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS build_manifest (
+            kind VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            content_hash VARCHAR NOT NULL
+        )
+        """
+    )
+
+
+def load_manifest(con, kind):
+    ensure_manifest(con)
+    rows = con.execute(
+        "SELECT name, content_hash FROM build_manifest WHERE kind = ?", [kind]
+    ).fetchall()
+    return dict(rows)
+
+
+def save_manifest(con, kind, hashes):
+    con.execute("DELETE FROM build_manifest WHERE kind = ?", [kind])
+    con.executemany(
+        "INSERT INTO build_manifest VALUES (?, ?, ?)",
+        [[kind, name, value] for name, value in hashes.items()],
+    )
+
+
+def table_exists(con, name):
+    return (
+        con.execute(
+            "SELECT count(*) FROM duckdb_tables() WHERE table_name = ?", [name]
+        ).fetchone()[0]
+        > 0
+    )
+
+
+def sync_exercises(con, exercises_df):
+    """Met à jour memory_state ligne par ligne selon le hash de chaque exercice.
+
+    last_reviewed n'est jamais écrasé pour un exercice déjà présent : seuls
+    les nouveaux exercices prennent la valeur du CSV.
+    """
+    # last_reviewed est exclu du hash : c'est un état, pas du contenu.
+    content_columns = [c for c in EXERCISE_COLUMNS if c != "last_reviewed"]
+    source = exercises_df[EXERCISE_COLUMNS].copy()
+    source["content_hash"] = row_hashes(source, content_columns)
+    hashes = dict(zip(source["exercise_name"], source["content_hash"]))
+
+    manifest = load_manifest(con, "exercise")
+    if not table_exists(con, "memory_state"):
+        manifest = {}
+        con.execute(
+            """
+            CREATE TABLE memory_state AS
+            SELECT * EXCLUDE (content_hash) FROM source LIMIT 0
+            """
+        )
+
+    changed = [name for name, value in hashes.items() if manifest.get(name) != value]
+    removed = [name for name in manifest if name not in hashes]
+    if not changed and not removed and manifest:
+        print("Exercices inchangés.")
+        return []
+
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.execute(
+            """
+            CREATE OR REPLACE TEMP TABLE previous_reviews AS
+            SELECT exercise_name, last_reviewed FROM memory_state
+            WHERE list_contains(?, exercise_name)
+            """,
+            [changed],
+        )
+        con.execute(
+            "DELETE FROM memory_state WHERE list_contains(?, exercise_name)",
+            [changed + removed],
+        )
+        con.execute(
+            f"""
+            INSERT INTO memory_state
+            SELECT {", ".join(
+                "coalesce(p.last_reviewed, s.last_reviewed)" if c == "last_reviewed"
+                else f"s.{c}"
+                for c in EXERCISE_COLUMNS
+            )}
+            FROM source s
+            LEFT JOIN previous_reviews p USING (exercise_name)
+            WHERE list_contains(?, s.exercise_name)
+            """,
+            [changed],
+        )
+        con.execute("DROP TABLE previous_reviews")
+        save_manifest(con, "exercise", hashes)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+    print(
+        f"{len(changed)} exercice(s) créé(s) ou mis à jour, {len(removed)} supprimé(s)."
+    )
+    return changed
+
+
+def sync_tables(con, tables_df):
+    """Ne reconstruit que les tables dont la définition a changé."""
+    hashes = dict(zip(tables_df["tables"], row_hashes(tables_df, TABLE_COLUMNS)))
+    manifest = load_manifest(con, "table")
+
+    changed = [
+        name
+        for name, value in hashes.items()
+        if manifest.get(name) != value or not table_exists(con, name)
+    ]
+    removed = [name for name in manifest if name not in hashes]
+    if not changed and not removed:
+        print("Tables inchangées.")
+        return []
+
+    con.execute("BEGIN TRANSACTION")
+    try:
+        create_tables(con, tables_df[tables_df["tables"].isin(changed)])
+        for name in removed:
+            con.execute(f'DROP TABLE IF EXISTS "{name}"')
+        save_manifest(con, "table", hashes)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return changed
+
+
+# -----------------------------------------------------------------------------------
+# CONSTRUCTION
+# -----------------------------------------------------------------------------------
+def build_database(con):
+    """Charge exercices et tables puis précalcule les solutions concernées."""
+    exercises_df = pd.read_csv(EXERCISES_FILE, delimiter=";", encoding="latin-1")
+    changed_exercises = sync_exercises(con, exercises_df)
+    exercises_df = con.execute("SELECT * FROM memory_state").fetchdf()
+    print(exercises_df)
+
+    tables_df = pd.read_csv(TABLES_FILE, delimiter=";", encoding="latin-1")
+    changed_tables = sync_tables(con, tables_df)
+
+    # Seules les solutions des exercices modifiés ou utilisant une table modifiée.
+    to_compute = exercises_df[
+        exercises_df["exercise_name"].isin(changed_exercises)
+        | exercises_df["tables_used"].map(
+            lambda tables: bool(set(parse_tables(tables)) & set(changed_tables))
         )
-        for item in data.split(",")
     ]
+    precompute_solutions(con, to_compute)
+    print(f"{len(to_compute)} solution(s) précalculée(s).")
+
 
-    table_df = pd.DataFrame(data_list)
+def database_lock(database=DATABASE):
+    """Verrou fichier qui sérialise la construction entre processus."""
+    return FileLock(f"{database}.lock")
 
-    con.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM table_df")
-    print(f"Table {table_name} créée ou mise à jour avec succès.")
+
+def init_db(database=DATABASE, lock=True):
+    """Construit ou met à jour la base ; sans effet si le contenu est inchangé.
+
+    Deux processus qui démarrent ensemble se succèdent sous le verrou : le
+    second ne fait que comparer le manifeste. `lock=False` si l'appelant
+    tient déjà database_lock().
+    """
+    with database_lock(database) if lock else contextlib.nullcontext():
+        download_missing_files()
+        con = duckdb.connect(database=database, read_only=False)
+        try:
+            build_database(con)
+        finally:
+            con.close()
 
 
-con.close()
+if __name__ == "__main__":
+    init_db()
 
 
 # directory = "/home/julien/sql_srs/exercises"
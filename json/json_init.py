@@ -1,8 +1,12 @@
-import auth
+# python -m json.json_init ne fonctionnerait pas (module json de la
+# bibliothèque standard) : lancer depuis la racine du dépôt,
+#   python json/json_init.py
+import os
+import sys
 
-users= {}
-codes = {}
-
-auth.save_users(users)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from auth import init_users_file  # noqa: E402
 
+if __name__ == "__main__":
+    init_users_file()
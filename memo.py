@@ -0,0 +1,24 @@
+import streamlit as st
+
+MEMO_KEY = "memo"
+
+
+def memoize(stage, key, compute):
+    """Résultat de `compute()` mémorisé dans la session, par étape.
+
+    Streamlit réexécute tout le script à chaque interaction ; une étape n'est
+    recalculée que si sa clé (les entrées dont elle dépend) a changé depuis
+    la dernière exécution de la session. Une seule valeur est gardée par
+    étape : la mémoire d'une session reste bornée.
+    """
+    memo = st.session_state.setdefault(MEMO_KEY, {})
+    entry = memo.get(stage)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    value = compute()
+    memo[stage] = (key, value)
+    return value
+
+
+def clear_memo():
+    st.session_state.pop(MEMO_KEY, None)
@@ -0,0 +1,234 @@
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import duckdb
+
+from tracing import span
+
+OUTBOX_DATABASE = "data/outbox.duckdb"
+
+SELECT_DUE = """
+    SELECT id, sender, recipient, message, attempts FROM outbox
+    WHERE status = 'pending' AND next_attempt_at <= ?
+    ORDER BY next_attempt_at
+    LIMIT ?
+"""
+# Un message envoyé ou abandonné est vidé : il contient le code de
+# réinitialisation en clair. La ligne reste comme trace de l'envoi.
+MARK_SENT = """
+    UPDATE outbox SET status = 'sent', sent_at = ?, message = '' WHERE id = ?
+"""
+MARK_RETRY = """
+    UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?
+    WHERE id = ?
+"""
+MARK_FAILED = """
+    UPDATE outbox SET attempts = ?, last_error = ?, status = 'failed', message = ''
+    WHERE id = ?
+"""
+CLEAR_DONE = (
+    "UPDATE outbox SET message = '' WHERE status <> 'pending' AND message <> ''"
+)
+INSERT_MESSAGE = """
+    INSERT INTO outbox (id, sender, recipient, message, status, attempts, next_attempt_at, created_at)
+    VALUES (?, ?, ?, ?, 'pending', 0, ?, ?)
+"""
+
+
+class SmtpTransport:
+    """Session SMTP unique, ouverte à la demande et réutilisée entre les envois.
+
+    La connexion (STARTTLS + login) n'est refaite que si le serveur l'a
+    fermée ou si elle est restée inactive plus de `idle_timeout` secondes.
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        username=None,
+        password=None,
+        starttls=True,
+        idle_timeout=60.0,
+        timeout=30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        self.close()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.username:
+            server.login(self.username, self.password)
+        self._server = server
+
+    def _ensure_connected(self):
+        if self._server is None:
+            self._connect()
+        elif time.monotonic() - self._last_used > self.idle_timeout:
+            try:
+                if self._server.noop()[0] != 250:
+                    self._connect()
+            except smtplib.SMTPException:
+                self._connect()
+
+    def send(self, sender, recipient, message):
+        for attempt in (1, 2):
+            self._ensure_connected()
+            try:
+                self._server.sendmail(sender, recipient, message)
+                self._last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._server = None
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except smtplib.SMTPException:
+                pass
+            self._server = None
+
+
+class FileTransport:
+    """Remplaçant local de SmtpTransport : chaque e-mail devient un fichier .eml."""
+
+    def __init__(self, directory="data/sent_mail"):
+        self.directory = directory
+
+    def send(self, sender, recipient, message):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.time_ns()}_{recipient}.eml")
+        with open(path, "w") as f:
+            f.write(message)
+
+    def close(self):
+        pass
+
+
+class Outbox:
+    """File d'envoi persistante des e-mails, vidée par un thread d'arrière-plan.
+
+    enqueue() ne fait qu'une insertion : la page Streamlit n'attend jamais le
+    serveur SMTP. En cas d'échec, l'envoi est retenté avec un délai qui
+    double à chaque tentative, jusqu'à `max_attempts`.
+    """
+
+    def __init__(
+        self,
+        transport,
+        database=OUTBOX_DATABASE,
+        max_attempts=5,
+        retry_delay=30.0,
+        batch_size=20,
+        poll_interval=30.0,
+    ):
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+        directory = os.path.dirname(database)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.con = duckdb.connect(database=database, read_only=False)
+        self.con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id VARCHAR NOT NULL,
+                sender VARCHAR NOT NULL,
+                recipient VARCHAR NOT NULL,
+                message VARCHAR NOT NULL,
+                status VARCHAR NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt_at TIMESTAMP NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                sent_at TIMESTAMP,
+                last_error VARCHAR
+            )
+            """
+        )
+        # Messages conservés par les versions précédentes.
+        self.con.execute(CLEAR_DONE)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(
+            target=self._run, name="outbox-worker", daemon=True
+        )
+        self._worker.start()
+
+    def enqueue(self, sender, recipient, message):
+        message_id = uuid.uuid4().hex
+        now = datetime.now()
+        self.con.cursor().execute(
+            INSERT_MESSAGE, [message_id, sender, recipient, message, now, now]
+        )
+        self._wake.set()
+        return message_id
+
+    def pending_count(self):
+        return (
+            self.con.cursor()
+            .execute("SELECT count(*) FROM outbox WHERE status = 'pending'")
+            .fetchone()[0]
+        )
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        self._worker.join(timeout)
+        self.transport.close()
+
+    def _run(self):
+        cursor = self.con.cursor()
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                sent = self.process_due(cursor)
+            except Exception as e:
+                logging.error(f"Erreur du worker d'envoi des e-mails : {e}")
+                sent = 0
+            if sent < self.batch_size:
+                self._wake.wait(self.poll_interval)
+
+    def process_due(self, cursor=None):
+        """Envoie les messages arrivés à échéance ; renvoie le nombre traité."""
+        cursor = cursor or self.con.cursor()
+        due = cursor.execute(SELECT_DUE, [datetime.now(), self.batch_size]).fetchall()
+        for message_id, sender, recipient, message, attempts in due:
+            try:
+                with span("smtp.send"):
+                    self.transport.send(sender, recipient, message)
+            except (smtplib.SMTPException, OSError) as e:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    cursor.execute(MARK_FAILED, [attempts, str(e), message_id])
+                else:
+                    delay = timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+                    cursor.execute(
+                        MARK_RETRY,
+                        [attempts, datetime.now() + delay, str(e), message_id],
+                    )
+                logging.error(f"Erreur SMTP ({recipient}, tentative {attempts}) : {e}")
+                continue
+            cursor.execute(MARK_SENT, [datetime.now(), message_id])
+            print("E-mail envoyé avec succès.")
+        return len(due)
@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+
+import bcrypt
+
+# Formats stockés :
+#   $scrypt$v=1$n=16384,r=8,p=1$<sel base64>$<hash base64>
+#   $2b$12$...                      (format natif de bcrypt)
+#   <64 caractères hexadécimaux>    (ancien SHA-256 sans sel, à migrer)
+SCRYPT_PREFIX = "$scrypt$v=1$"
+LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """Hachage salé à coût réglable, avec détection des hachages à migrer."""
+
+    def __init__(
+        self, scheme="scrypt", scrypt_n=2**14, scrypt_r=8, scrypt_p=1, bcrypt_rounds=12
+    ):
+        if scheme not in ("scrypt", "bcrypt"):
+            raise ValueError(f"Schéma de hachage non supporté : {scheme}")
+        self.scheme = scheme
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.bcrypt_rounds = bcrypt_rounds
+
+    @staticmethod
+    def _scrypt(password, salt, n, r, p):
+        return hashlib.scrypt(
+            password.encode(),
+            salt=salt,
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r,
+            dklen=32,
+        )
+
+    def hash(self, password):
+        if self.scheme == "bcrypt":
+            salt = bcrypt.gensalt(rounds=self.bcrypt_rounds)
+            return bcrypt.hashpw(password.encode(), salt).decode()
+
+        salt = os.urandom(16)
+        key = self._scrypt(password, salt, self.scrypt_n, self.scrypt_r, self.scrypt_p)
+        return (
+            f"{SCRYPT_PREFIX}n={self.scrypt_n},r={self.scrypt_r},p={self.scrypt_p}"
+            f"${_b64encode(salt)}${_b64encode(key)}"
+        )
+
+    @staticmethod
+    def _parse_scrypt(stored):
+        params, salt, key = stored[len(SCRYPT_PREFIX) :].split("$")
+        cost = dict(item.split("=") for item in params.split(","))
+        return (
+            int(cost["n"]),
+            int(cost["r"]),
+            int(cost["p"]),
+            _b64decode(salt),
+            _b64decode(key),
+        )
+
+    def verify(self, password, stored):
+        if not stored:
+            return False
+        if stored.startswith(SCRYPT_PREFIX):
+            n, r, p, salt, key = self._parse_scrypt(stored)
+            return hmac.compare_digest(self._scrypt(password, salt, n, r, p), key)
+        if stored.startswith("$2"):
+            return bcrypt.checkpw(password.encode(), stored.encode())
+        if LEGACY_SHA256.match(stored):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, stored)
+        return False
+
+    def needs_rehash(self, stored):
+        """Vrai pour un ancien SHA-256, un autre schéma ou un coût plus faible."""
+        if self.scheme == "scrypt":
+            if not stored.startswith(SCRYPT_PREFIX):
+                return True
+            n, r, p, _, _ = self._parse_scrypt(stored)
+            return (n, r, p) != (self.scrypt_n, self.scrypt_r, self.scrypt_p)
+
+        if not stored.startswith("$2"):
+            return True
+        return int(stored.split("$")[2]) != self.bcrypt_rounds
+
+
+def hasher_from_env():
+    """Paramètres de coût lus dans l'environnement (SQL_SRS_PASSWORD_*)."""
+    return PasswordHasher(
+        scheme=os.environ.get("SQL_SRS_PASSWORD_SCHEME", "scrypt"),
+        scrypt_n=int(os.environ.get("SQL_SRS_PASSWORD_SCRYPT_N", 2**14)),
+        scrypt_r=int(os.environ.get("SQL_SRS_PASSWORD_SCRYPT_R", 8)),
+        scrypt_p=int(os.environ.get("SQL_SRS_PASSWORD_SCRYPT_P", 1)),
+        bcrypt_rounds=int(os.environ.get("SQL_SRS_PASSWORD_BCRYPT_ROUNDS", 12)),
+    )
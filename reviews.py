@@ -0,0 +1,158 @@
+from datetime import date
+
+from dao import table_exists
+from scheduler import DEFAULT_EASE, next_due_date, sm2
+
+SELECT_NEXT_DUE = """
+    SELECT m.exercise_name,
+           coalesce(r.due_date, TRY_CAST(m.last_reviewed AS DATE)) AS due_date
+    FROM memory_state m
+    LEFT JOIN review_state r
+        ON r.username = $username AND r.exercise_name = m.exercise_name
+    WHERE ($theme IS NULL OR m.theme = $theme)
+      AND ($author IS NULL OR m.author = $author)
+      AND ($difficulty IS NULL OR m.difficulty = $difficulty)
+    ORDER BY due_date NULLS FIRST, m.exercise_name
+    LIMIT 1
+"""
+SELECT_DUE_DATES = """
+    SELECT exercise_name, due_date FROM review_state WHERE username = ?
+"""
+SELECT_STATES = """
+    SELECT exercise_name, repetitions, interval, ease FROM review_state
+    WHERE username = ? AND list_contains(?, exercise_name)
+"""
+UPDATE_STATE = """
+    UPDATE review_state
+    SET due_date = ?, interval = ?, ease = ?, repetitions = ?
+    WHERE username = ? AND exercise_name = ?
+"""
+INSERT_STATE = """
+    INSERT INTO review_state (due_date, interval, ease, repetitions, username, exercise_name)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+DELETE_STATES = "DELETE FROM review_state WHERE username = ?"
+REVIEW_COLUMNS = "username, exercise_name, due_date, interval, ease, repetitions"
+CREATE_REVIEW_STATE = """
+    CREATE TABLE IF NOT EXISTS review_state (
+        username VARCHAR NOT NULL,
+        exercise_name VARCHAR NOT NULL,
+        due_date DATE NOT NULL,
+        interval INTEGER NOT NULL,
+        ease DOUBLE NOT NULL,
+        repetitions INTEGER NOT NULL,
+        PRIMARY KEY (username, exercise_name)
+    )
+"""
+
+
+def ensure_review_state(con):
+    # Clé primaire (username, exercise_name) : les mises à jour ne modifient
+    # que des colonnes non indexées, ce que DuckDB permet. Pas d'index sur
+    # due_date : DuckDB ne s'en sert pas pour ORDER BY ... LIMIT 1.
+    con.execute("DROP INDEX IF EXISTS review_state_due_idx")
+    constrained = con.execute(
+        """
+        SELECT count(*) FROM duckdb_constraints()
+        WHERE table_name = 'review_state' AND constraint_type = 'PRIMARY KEY'
+        """
+    ).fetchone()[0]
+    if not constrained and table_exists(con, "review_state"):
+        # Ancienne table sans clé : reconstruite avec, en gardant les lignes.
+        con.execute("BEGIN TRANSACTION")
+        try:
+            con.execute("CREATE TABLE review_state_old AS SELECT * FROM review_state")
+            con.execute("DROP TABLE review_state")
+            con.execute(CREATE_REVIEW_STATE)
+            con.execute(
+                f"INSERT INTO review_state SELECT {REVIEW_COLUMNS} FROM review_state_old"
+            )
+            con.execute("DROP TABLE review_state_old")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    con.execute(CREATE_REVIEW_STATE)
+
+
+def next_due_exercise(con, username, theme=None, author=None, difficulty=None):
+    """Prochain exercice à réviser pour l'utilisateur, ou None.
+
+    Un exercice jamais révisé est dû à la date last_reviewed de memory_state.
+    La requête parcourt toute la banque (DuckDB n'utilise pas d'index pour
+    un tri) ; LIMIT 1 évite seulement de trier et de renvoyer tout le reste.
+    """
+    row = con.execute(
+        SELECT_NEXT_DUE,
+        {
+            "username": username,
+            "theme": theme,
+            "author": author,
+            "difficulty": difficulty,
+        },
+    ).fetchone()
+
+    if row is None or (row[1] is not None and row[1] > date.today()):
+        return None
+    return row[0]
+
+
+def get_due_dates(con, username):
+    return dict(con.execute(SELECT_DUE_DATES, [username]).fetchall())
+
+
+def apply_reviews(con, username, grades, today=None):
+    """Applique SM-2 à plusieurs exercices, dans la transaction en cours.
+
+    `grades` associe un nom d'exercice à la qualité de la réponse (0-5).
+    Renvoie les nouvelles échéances. Utilisé tel quel par DatabaseWriter,
+    qui regroupe plusieurs opérations dans une transaction.
+    """
+    states = {
+        name: (repetitions, interval, ease)
+        for name, repetitions, interval, ease in con.execute(
+            SELECT_STATES, [username, list(grades)]
+        ).fetchall()
+    }
+
+    updates, inserts, due_dates = [], [], {}
+    for exercise_name, quality in grades.items():
+        state = states.get(exercise_name, (0, 0, DEFAULT_EASE))
+        repetitions, interval, ease = sm2(quality, *state)
+        due_dates[exercise_name] = next_due_date(interval, today)
+        values = [
+            due_dates[exercise_name],
+            interval,
+            ease,
+            repetitions,
+            username,
+            exercise_name,
+        ]
+        (updates if exercise_name in states else inserts).append(values)
+
+    # executemany prépare la requête une fois pour tout le lot.
+    if updates:
+        con.executemany(UPDATE_STATE, updates)
+    if inserts:
+        con.executemany(INSERT_STATE, inserts)
+    return due_dates
+
+
+def record_reviews(con, username, grades, today=None):
+    """apply_reviews dans une transaction dédiée."""
+    con.execute("BEGIN TRANSACTION")
+    try:
+        due_dates = apply_reviews(con, username, grades, today)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return due_dates
+
+
+def record_review(con, username, exercise_name, quality, today=None):
+    return record_reviews(con, username, {exercise_name: quality}, today)[exercise_name]
+
+
+def reset_reviews(con, username):
+    con.execute(DELETE_STATES, [username])
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+# Boutons proposés après un exercice : libellé -> qualité de la réponse (0-5).
+REVIEW_GRADES = {
+    "À revoir": 1,
+    "Difficile": 3,
+    "Correct": 4,
+    "Facile": 5,
+}
+
+
+def sm2(quality, repetitions=0, interval=0, ease=DEFAULT_EASE):
+    """Algorithme SuperMemo-2 : renvoie (repetitions, interval, ease).
+
+    Une réponse de qualité < 3 remet la série à zéro ; sinon l'intervalle
+    passe à 1 jour, puis 6 jours, puis est multiplié par le facteur de
+    facilité, lui-même ajusté selon la qualité.
+    """
+    if quality < 3:
+        repetitions = 0
+        interval = 1
+    else:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = round(interval * ease)
+        repetitions += 1
+
+    ease = ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    return repetitions, interval, max(MIN_EASE, ease)
+
+
+def next_due_date(interval, today=None):
+    return (today or date.today()) + timedelta(days=interval)
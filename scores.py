@@ -0,0 +1,145 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+
+# Points d'un exercice réussi pour la première fois, selon sa difficulté. Le
+# mode au hasard ne rapporte rien (pas d'incitation, voir README).
+POINTS = {"easy": 10, "medium": 20, "hard": 30}
+UNSCORED_MODES = ("random",)
+
+SELECT_SOLVED = """
+    SELECT count(*) FILTER (WHERE correct), count(*) FILTER (WHERE points > 0)
+    FROM attempts
+    WHERE username = ? AND exercise_name = ?
+"""
+INSERT_ATTEMPT = "INSERT INTO attempts VALUES (?, ?, ?, ?, ?)"
+SELECT_SCORE = """
+    SELECT points, attempts, solved FROM user_scores WHERE username = ?
+"""
+UPDATE_SCORE = """
+    UPDATE user_scores
+    SET points = ?, attempts = ?, solved = ?, updated_at = ?
+    WHERE username = ?
+"""
+INSERT_SCORE = """
+    INSERT INTO user_scores (points, attempts, solved, updated_at, username)
+    VALUES (?, ?, ?, ?, ?)
+"""
+SELECT_SCORES = "SELECT username, points, solved FROM user_scores"
+
+
+def ensure_scores(con):
+    # Pas de clé primaire : l'unicité de user_scores est assurée par
+    # record_attempt, qui ne s'exécute que dans DatabaseWriter.
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attempts (
+            username VARCHAR NOT NULL,
+            exercise_name VARCHAR NOT NULL,
+            attempted_at TIMESTAMP NOT NULL,
+            correct BOOLEAN NOT NULL,
+            points INTEGER NOT NULL
+        )
+        """
+    )
+    con.execute(
+        """
+        CREATE INDEX IF NOT EXISTS attempts_user_idx
+        ON attempts (username, exercise_name)
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_scores (
+            username VARCHAR NOT NULL,
+            points INTEGER NOT NULL,
+            attempts INTEGER NOT NULL,
+            solved INTEGER NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+        """
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS user_scores_user_idx ON user_scores (username)"
+    )
+
+
+def exercise_points(difficulty, mode):
+    if mode in UNSCORED_MODES:
+        return 0
+    return POINTS.get(str(difficulty), 0)
+
+
+def record_attempt(con, username, exercise_name, correct, points, now=None):
+    """Journalise une tentative et met à jour l'agrégat de l'utilisateur.
+
+    Seule la première réussite notée d'un exercice rapporte des points : une
+    réussite en mode au hasard (0 point) ne les fait pas perdre. Renvoie
+    l'agrégat {points, attempts, solved}. À exécuter dans une transaction
+    (DatabaseWriter) : le journal et l'agrégat restent cohérents.
+    """
+    now = now or datetime.now()
+    solves, scored = con.execute(SELECT_SOLVED, [username, exercise_name]).fetchone()
+    first_solve = correct and solves == 0
+    earned = points if correct and scored == 0 else 0
+    con.execute(INSERT_ATTEMPT, [username, exercise_name, now, correct, earned])
+
+    row = con.execute(SELECT_SCORE, [username]).fetchone()
+    total, attempts, solved = row or (0, 0, 0)
+    score = {
+        "points": total + earned,
+        "attempts": attempts + 1,
+        "solved": solved + int(first_solve),
+    }
+    values = [score["points"], score["attempts"], score["solved"], now, username]
+    con.execute(UPDATE_SCORE if row else INSERT_SCORE, values)
+    return score
+
+
+class Leaderboard:
+    """Classement en mémoire, tenu à jour à chaque tentative notée.
+
+    Les entrées sont gardées triées ((-points, username)) : top(k) lit les k
+    premières en O(k) et rank() cherche par dichotomie, sans jamais
+    réagréger l'historique. Construit une fois par processus depuis
+    user_scores.
+    """
+
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self._scores = {}
+        self._order = []
+        for username, points, solved in rows:
+            self.update(username, points, solved)
+
+    def update(self, username, points, solved):
+        with self._lock:
+            current = self._scores.get(username)
+            # Les scores ne font que croître : une mise à jour arrivée en
+            # retard (deux onglets du même utilisateur) est ignorée.
+            if current is not None and current >= (points, solved):
+                return
+            if current is not None and current[0] > 0:
+                del self._order[bisect_left(self._order, (-current[0], username))]
+            self._scores[username] = (points, solved)
+            if points > 0:
+                insort(self._order, (-points, username))
+
+    def top(self, k=10):
+        with self._lock:
+            return [
+                (username, -points, self._scores[username][1])
+                for points, username in self._order[:k]
+            ]
+
+    def rank(self, username):
+        """Rang (à partir de 1) de l'utilisateur, None s'il n'a aucun point."""
+        with self._lock:
+            points, _ = self._scores.get(username, (0, 0))
+            if points <= 0:
+                return None
+            return bisect_left(self._order, (-points, username)) + 1
+
+
+def load_leaderboard(con):
+    return Leaderboard(con.execute(SELECT_SCORES).fetchall())
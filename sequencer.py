@@ -0,0 +1,189 @@
+"""Choix du prochain exercice : révisions SM-2, tirage au hasard, mode histoire.
+
+Le tirage au hasard et le mode histoire préparent leurs structures une fois
+par version du catalogue (et par combinaison de filtres, au premier usage) :
+le choix est ensuite en O(1). Les révisions SM-2 interrogent la base à
+chaque choix (next_due_exercise) : un parcours en O(N) de la banque filtrée.
+"""
+
+import random
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from reviews import next_due_exercise
+
+# Ordre du mode histoire ; les difficultés inconnues viennent en dernier.
+DIFFICULTY_ORDER = ("easy", "medium", "hard")
+# Poids du tirage au hasard : les exercices difficiles sortent plus souvent.
+DIFFICULTY_WEIGHTS = {"easy": 1.0, "medium": 2.0, "hard": 3.0}
+STORY_STATE_KEY = "story_positions"
+
+
+@dataclass(frozen=True)
+class AliasTable:
+    """Table d'alias de Vose : tirage pondéré en O(1) parmi `names`."""
+
+    names: np.ndarray
+    prob: np.ndarray
+    alias: np.ndarray
+
+    def sample(self, rng=random):
+        i = rng.randrange(len(self.names))
+        return self.names[i if rng.random() < self.prob[i] else self.alias[i]]
+
+
+def build_alias_table(names, weights):
+    n = len(weights)
+    total = float(sum(weights))
+    prob = np.asarray(weights, dtype=np.float64) * n / total
+    alias = np.arange(n, dtype=np.int64)
+    small = [i for i in range(n) if prob[i] < 1.0]
+    large = [i for i in range(n) if prob[i] >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        alias[less] = more
+        prob[more] -= 1.0 - prob[less]
+        (small if prob[more] < 1.0 else large).append(more)
+    # Restes dus aux arrondis : probabilité 1.
+    for i in small + large:
+        prob[i] = 1.0
+    return AliasTable(np.asarray(names, dtype=object), prob, alias)
+
+
+class Strategy:
+    """Stratégie de choix ; les structures préparées sont gardées par filtre.
+
+    `select(con, username, state, theme, author, difficulty)` renvoie un nom
+    d'exercice ou None. `state` est l'état de la session (st.session_state).
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._structures = {}
+        self._lock = threading.Lock()
+
+    def structure(self, key, build):
+        structure = self._structures.get(key)
+        if structure is None:
+            with self._lock:
+                structure = self._structures.get(key)
+                if structure is None:
+                    structure = self._structures[key] = build()
+        return structure
+
+    def names(self, rows):
+        return (
+            self.snapshot.table["exercise_name"]
+            .take(rows)
+            .to_numpy(zero_copy_only=False)
+        )
+
+    def select(self, con, username, state, theme=None, author=None, difficulty=None):
+        raise NotImplementedError
+
+    def state_key(self, state, theme=None, author=None, difficulty=None):
+        """Part de l'état de session dont dépend select (clé de mémorisation)."""
+        return None
+
+
+class SrsStrategy(Strategy):
+    """Ordre des échéances SM-2 : requête LIMIT 1, O(N) sur la banque filtrée."""
+
+    def select(self, con, username, state, theme=None, author=None, difficulty=None):
+        return next_due_exercise(con, username, theme, author, difficulty)
+
+
+class RandomStrategy(Strategy):
+    """Tirage pondéré par la difficulté, sans tenir compte des échéances."""
+
+    def __init__(self, snapshot, weights=None, rng=random):
+        super().__init__(snapshot)
+        self.weights = weights or DIFFICULTY_WEIGHTS
+        self.rng = rng
+
+    def table(self, **filters):
+        def build():
+            rows = self.snapshot.rows(**filters)
+            if len(rows) == 0:
+                return None
+            facet = self.snapshot.facets["difficulty"]
+            value_weights = np.array(
+                [self.weights.get(str(value), 1.0) for value in facet.values] + [1.0]
+            )
+            # Code -1 (difficulté NULL) : dernier poids.
+            return build_alias_table(self.names(rows), value_weights[facet.codes[rows]])
+
+        return self.structure(tuple(sorted(filters.items())), build)
+
+    def select(self, con, username, state, theme=None, author=None, difficulty=None):
+        table = self.table(theme=theme, author=author, difficulty=difficulty)
+        return None if table is None else table.sample(self.rng)
+
+
+class StoryStrategy(Strategy):
+    """Parcours de easy à hard ; la position avance à chaque exercice réussi.
+
+    Le parcours ignore le filtre de difficulté : c'est lui qui la fait monter.
+    La position est gardée dans la session, par thème et auteur.
+    """
+
+    def path(self, theme=None, author=None):
+        def build():
+            rows = self.snapshot.rows(theme=theme, author=author)
+            facet = self.snapshot.facets["difficulty"]
+            rank = {value: i for i, value in enumerate(DIFFICULTY_ORDER)}
+            value_ranks = np.array(
+                [rank.get(str(value), len(rank)) for value in facet.values]
+                + [len(rank)]
+            )
+            # Tri stable : à difficulté égale, l'ordre du catalogue (par nom).
+            order = np.argsort(value_ranks[facet.codes[rows]], kind="stable")
+            return self.names(rows[order])
+
+        return self.structure((theme, author), build)
+
+    @staticmethod
+    def position(state, theme=None, author=None):
+        return state.get(STORY_STATE_KEY, {}).get((theme, author), 0)
+
+    @staticmethod
+    def advance(state, theme=None, author=None):
+        positions = state.setdefault(STORY_STATE_KEY, {})
+        positions[(theme, author)] = positions.get((theme, author), 0) + 1
+
+    @staticmethod
+    def restart(state, theme=None, author=None):
+        state.get(STORY_STATE_KEY, {}).pop((theme, author), None)
+
+    def state_key(self, state, theme=None, author=None, difficulty=None):
+        return self.position(state, theme, author)
+
+    def select(self, con, username, state, theme=None, author=None, difficulty=None):
+        path = self.path(theme, author)
+        position = self.position(state, theme, author)
+        if position >= len(path):
+            return None
+        return path[position]
+
+
+STRATEGIES = {
+    "srs": SrsStrategy,
+    "random": RandomStrategy,
+    "story": StoryStrategy,
+}
+
+
+class Sequencer:
+    """Les stratégies de STRATEGIES, préparées pour un instantané du catalogue."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.strategies = {name: cls(snapshot) for name, cls in STRATEGIES.items()}
+
+    def next_exercise(self, mode, con, username, state, **filters):
+        return self.strategies[mode].select(con, username, state, **filters)
+
+    def state_key(self, mode, state, **filters):
+        return self.strategies[mode].state_key(state, **filters)
@@ -0,0 +1,164 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+import streamlit as st
+from filelock import FileLock
+
+SESSION_PARAM = "session"
+SECRET_FILE = "data/session_secret"
+DEFAULT_TTL = 7 * 24 * 3600
+
+SELECT_REVOCATIONS = """
+    SELECT username, token_id, revoked_at FROM session_revocations
+    WHERE expires_at > ?
+"""
+INSERT_REVOCATION = "INSERT INTO session_revocations VALUES (?, ?, ?, ?)"
+
+
+def ensure_revocations(con):
+    # token_id NULL : tous les jetons de l'utilisateur émis avant revoked_at
+    # (changement de mot de passe). Horodatages en millisecondes.
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_revocations (
+            username VARCHAR NOT NULL,
+            token_id VARCHAR,
+            revoked_at BIGINT NOT NULL,
+            expires_at BIGINT NOT NULL
+        )
+        """
+    )
+
+
+def load_revocations(con, now_ms=None):
+    now_ms = now_ms or _now_ms()
+    return con.execute(SELECT_REVOCATIONS, [now_ms]).fetchall()
+
+
+def save_revocation(con, username, token_id, revoked_at, expires_at):
+    con.execute(INSERT_REVOCATION, [username, token_id, revoked_at, expires_at])
+
+
+def session_secret(path=SECRET_FILE):
+    """Clé HMAC : SQL_SRS_SESSION_SECRET, sinon [session] secret_key des
+    secrets, sinon une clé aléatoire créée une fois dans data/."""
+    secret = os.environ.get("SQL_SRS_SESSION_SECRET")
+    if secret:
+        return secret.encode()
+    if st.secrets.load_if_toml_exists() and "session" in st.secrets:
+        return st.secrets["session"]["secret_key"].encode()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with FileLock(f"{path}.lock"):
+        if not os.path.exists(path):
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+        with open(path) as f:
+            return f.read().strip().encode()
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokens:
+    """Jetons de session signés (HMAC-SHA256) et datés.
+
+    Un jeton se vérifie localement : signature, expiration, puis liste de
+    révocation gardée en mémoire. Aucune lecture du stockage des
+    utilisateurs : une reconnexion ou un rafraîchissement de page ne coûte
+    qu'un HMAC. revoke et revoke_user renvoient la ligne à enregistrer dans
+    session_revocations, pour que la liste survive à un redémarrage.
+    """
+
+    def __init__(self, secret, ttl=DEFAULT_TTL, revocations=()):
+        self._secret = secret
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._revoked_tokens = set()
+        self._revoked_users = {}
+        for username, token_id, revoked_at in revocations:
+            self._add_revocation(username, token_id, revoked_at)
+
+    def _sign(self, payload):
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def issue(self, username, now_ms=None):
+        now_ms = now_ms or _now_ms()
+        payload = json.dumps(
+            {
+                "u": username,
+                "iat": now_ms,
+                "exp": now_ms + self.ttl * 1000,
+                "jti": secrets.token_hex(8),
+            },
+            separators=(",", ":"),
+        ).encode()
+        return f"{_b64encode(payload)}.{_b64encode(self._sign(payload))}"
+
+    def decode(self, token):
+        """Contenu d'un jeton correctement signé, sinon None (expiré ou non)."""
+        try:
+            payload, signature = token.split(".")
+            payload = _b64decode(payload)
+            if not hmac.compare_digest(self._sign(payload), _b64decode(signature)):
+                return None
+            return json.loads(payload)
+        except (ValueError, TypeError):
+            return None
+
+    def verify(self, token, now_ms=None):
+        """Nom de l'utilisateur si le jeton est valide, sinon None."""
+        claims = self.decode(token)
+        if claims is None or claims["exp"] <= (now_ms or _now_ms()):
+            return None
+        with self._lock:
+            if claims["jti"] in self._revoked_tokens:
+                return None
+            if claims["iat"] <= self._revoked_users.get(claims["u"], -1):
+                return None
+        return claims["u"]
+
+    def _add_revocation(self, username, token_id, revoked_at):
+        with self._lock:
+            if token_id is not None:
+                self._revoked_tokens.add(token_id)
+            else:
+                previous = self._revoked_users.get(username, -1)
+                self._revoked_users[username] = max(previous, revoked_at)
+
+    def revoke(self, token, now_ms=None):
+        """Déconnexion : révoque ce jeton seulement."""
+        claims = self.decode(token)
+        if claims is None:
+            return None
+        now_ms = now_ms or _now_ms()
+        self._add_revocation(claims["u"], claims["jti"], now_ms)
+        return claims["u"], claims["jti"], now_ms, claims["exp"]
+
+    def revoke_user(self, username, now_ms=None):
+        """Changement de mot de passe : révoque tous les jetons déjà émis."""
+        now_ms = now_ms or _now_ms()
+        self._add_revocation(username, None, now_ms)
+        return username, None, now_ms, now_ms + self.ttl * 1000
+
+
+def tokens_from_env(revocations=()):
+    # SQL_SRS_SESSION_TTL : durée de validité d'un jeton, en secondes.
+    ttl = int(os.environ.get("SQL_SRS_SESSION_TTL", DEFAULT_TTL))
+    return SessionTokens(session_secret(), ttl, revocations)
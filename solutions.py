@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+import uuid
+
+import duckdb
+
+from dao import quote_identifier
+
+SOLUTIONS_DIR = "data/solutions"
+
+
+def content_hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def parse_tables(tables_used):
+    if isinstance(tables_used, str):
+        tables_used = tables_used.split(",")
+    return sorted({table.strip() for table in tables_used if table.strip()})
+
+
+def table_fingerprint(con, table):
+    """Empreinte du schéma et du contenu d'une table (indépendante de l'ordre)."""
+    columns = con.execute(
+        """
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_name = ? ORDER BY ordinal_position
+        """,
+        [table],
+    ).fetchall()
+    count, checksum = con.execute(
+        f"SELECT count(*), sum(hash(t)) FROM {quote_identifier(table)} t"
+    ).fetchone()
+    return content_hash(columns, count, checksum)
+
+
+def tables_fingerprint(con, tables):
+    return content_hash(
+        *(table_fingerprint(con, table) for table in parse_tables(tables))
+    )
+
+
+def solution_path(query, tables_hash):
+    """Fichier Parquet du résultat : la requête et les tables en sont la clé."""
+    return os.path.join(
+        SOLUTIONS_DIR, f"{content_hash(query)[:16]}_{tables_hash[:16]}.parquet"
+    )
+
+
+def compute_solution(con, query, tables_hash):
+    """Exécute la requête solution et stocke son résultat en Parquet."""
+    query = query.strip().rstrip(";")
+    os.makedirs(SOLUTIONS_DIR, exist_ok=True)
+    path = solution_path(query, tables_hash)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+    con.execute(f"COPY ({query}) TO '{tmp_path}' (FORMAT PARQUET)")
+    # Remplacement atomique : deux sessions qui calculent la même solution
+    # écrivent le même contenu.
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_solution(con, exercise_name, query, tables_used, tables_hash=None):
+    """Résultat de la solution, lu depuis le cache s'il est encore valide.
+
+    Le nom du fichier dépend de la requête et du contenu des tables
+    utilisées : il change, et le cache est donc invalidé, dès que l'une ou
+    l'autre change. Aucune écriture en base. En cas d'échec de la mise en
+    cache (colonnes en double par exemple), la requête est simplement
+    exécutée.
+    """
+    query = query.strip().rstrip(";")
+    if tables_hash is None:
+        tables_hash = tables_fingerprint(con, tables_used)
+
+    path = solution_path(query, tables_hash)
+    if not os.path.exists(path):
+        try:
+            path = compute_solution(con, query, tables_hash)
+        except (duckdb.Error, OSError) as e:
+            logging.error(f"Solution de {exercise_name} non mise en cache : {e}")
+            return con.execute(query).df()
+
+    return con.execute("SELECT * FROM read_parquet(?)", [path]).df()
+
+
+def precompute_solutions(con, exercises_df):
+    for _, exercise in exercises_df.iterrows():
+        query = str(exercise["answers"]).strip('"')
+        try:
+            tables_hash = tables_fingerprint(con, exercise["tables_used"])
+            compute_solution(con, query, tables_hash)
+        except duckdb.Error as e:
+            print(f"Solution de {exercise['exercise_name']} non calculée : {e}")
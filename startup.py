@@ -0,0 +1,48 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import streamlit as st
+
+from auth import download_json
+from db import get_connection, get_query_executor
+from tracing import traced
+
+
+@traced("startup.sync_users")
+def _sync_users():
+    # Le téléchargement écrit aussi la copie locale json/users.json.
+    download_json()
+
+
+@traced("startup.prepare_database")
+def _prepare_database():
+    get_connection()
+    get_query_executor()
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logging.error(
+            f"Échec de l'initialisation en arrière-plan : {future.exception()}"
+        )
+
+
+@st.cache_resource
+def start_background_sync():
+    """Lance une fois par processus, en parallèle et sans bloquer la page :
+    la synchronisation des utilisateurs et la préparation de la base."""
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+    tasks = {
+        "users": pool.submit(_sync_users),
+        "database": pool.submit(_prepare_database),
+    }
+    for future in tasks.values():
+        future.add_done_callback(_log_failure)
+    return tasks
+
+
+def wait_for_database():
+    task = start_background_sync()["database"]
+    if not task.done():
+        with st.spinner("Préparation des exercices..."):
+            wait([task])
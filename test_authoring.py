@@ -0,0 +1,40 @@
+import json
+
+from authoring import BUNDLE_FILE, validate_bundles
+
+EXERCISE = {
+    "exercise_name": "count_items",
+    "theme": "select",
+    "difficulty": "easy",
+    "author": "alice",
+    "question": "Combien d'articles ?",
+    "answers": "SELECT count(*) FROM items",
+    "tables_used": "items",
+}
+
+
+def write_bundle(directory, content):
+    directory.mkdir()
+    (directory / "items.csv").write_text("id,label\n1,a\n2,b\n")
+    (directory / BUNDLE_FILE).write_text(json.dumps(content))
+    return str(directory)
+
+
+def test_malformed_bundles_are_reported(tmp_path):
+    valid = {"tables": {"items": "items.csv"}, "exercises": [EXERCISE]}
+    paths = [
+        write_bundle(tmp_path / "valid", valid),
+        write_bundle(tmp_path / "list", [valid]),
+        write_bundle(tmp_path / "truncated", valid),
+        write_bundle(tmp_path / "tables", {**valid, "tables": ["items.csv"]}),
+        write_bundle(tmp_path / "exercises", {**valid, "exercises": ["x"]}),
+        write_bundle(
+            tmp_path / "fields",
+            {**valid, "exercises": [{**EXERCISE, "tables_used": 3}]},
+        ),
+    ]
+    (tmp_path / "truncated" / BUNDLE_FILE).write_text("{")
+
+    reports = validate_bundles(paths, workers=2)
+    assert [report.ok for report in reports] == [True] + [False] * 5
+    assert all(len(report.errors) == 1 for report in reports[1:])
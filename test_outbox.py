@@ -0,0 +1,166 @@
+import smtplib
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import outbox as outbox_module
+from outbox import FileTransport, Outbox, SmtpTransport
+
+
+class StubTransport:
+    """Transport en mémoire qui échoue les `failures` premiers envois."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def send(self, sender, recipient, message):
+        if self.failures > 0:
+            self.failures -= 1
+            raise smtplib.SMTPServerDisconnected("serveur indisponible")
+        self.sent.append((sender, recipient, message))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    created = []
+
+    def make(transport, **options):
+        outbox = Outbox(transport, database=str(tmp_path / "outbox.duckdb"), **options)
+        # Worker arrêté : les tests appellent process_due eux-mêmes.
+        outbox.stop()
+        created.append(outbox)
+        return outbox
+
+    yield make
+    for outbox in created:
+        outbox.con.close()
+
+
+def rows(outbox):
+    return outbox.con.execute(
+        "SELECT status, attempts, message, next_attempt_at FROM outbox"
+    ).fetchall()
+
+
+def make_due(outbox):
+    outbox.con.execute(
+        "UPDATE outbox SET next_attempt_at = ?",
+        [datetime.now() - timedelta(seconds=1)],
+    )
+
+
+def test_messages_are_sent_in_batches(make_outbox):
+    transport = StubTransport()
+    outbox = make_outbox(transport, batch_size=10)
+    for i in range(25):
+        outbox.enqueue("srs@example.com", f"user_{i}@example.com", f"code {i}")
+
+    assert outbox.process_due() == 10
+    assert outbox.process_due() == 10
+    assert outbox.process_due() == 5
+    assert outbox.process_due() == 0
+    assert len(transport.sent) == 25
+    assert outbox.pending_count() == 0
+
+
+def test_sent_messages_are_cleared(make_outbox):
+    outbox = make_outbox(StubTransport())
+    outbox.enqueue("srs@example.com", "alice@example.com", "code ABC123")
+    outbox.process_due()
+
+    [(status, _, message, _)] = rows(outbox)
+    assert (status, message) == ("sent", "")
+
+
+def test_failed_send_is_retried_with_backoff(make_outbox):
+    transport = StubTransport(failures=2)
+    outbox = make_outbox(transport, retry_delay=60.0)
+    outbox.enqueue("srs@example.com", "alice@example.com", "code ABC123")
+
+    before = datetime.now()
+    outbox.process_due()
+    [(status, attempts, message, next_attempt_at)] = rows(outbox)
+    assert (status, attempts, message) == ("pending", 1, "code ABC123")
+    assert next_attempt_at >= before + timedelta(seconds=60)
+    # Pas encore à échéance.
+    assert outbox.process_due() == 0
+
+    make_due(outbox)
+    before = datetime.now()
+    outbox.process_due()
+    [(_, attempts, _, next_attempt_at)] = rows(outbox)
+    assert attempts == 2
+    assert next_attempt_at >= before + timedelta(seconds=120)
+
+    make_due(outbox)
+    outbox.process_due()
+    assert transport.sent == [("srs@example.com", "alice@example.com", "code ABC123")]
+    assert rows(outbox)[0][:3] == ("sent", 2, "")
+
+
+def test_message_is_abandoned_after_max_attempts(make_outbox):
+    outbox = make_outbox(StubTransport(failures=10), max_attempts=3)
+    outbox.enqueue("srs@example.com", "alice@example.com", "code ABC123")
+    for _ in range(3):
+        make_due(outbox)
+        outbox.process_due()
+
+    [(status, attempts, message, _)] = rows(outbox)
+    assert (status, attempts, message) == ("failed", 3, "")
+    make_due(outbox)
+    assert outbox.process_due() == 0
+
+
+def test_worker_sends_to_file_transport(tmp_path):
+    directory = tmp_path / "sent_mail"
+    outbox = Outbox(
+        FileTransport(str(directory)),
+        database=str(tmp_path / "outbox.duckdb"),
+        poll_interval=0.05,
+    )
+    try:
+        outbox.enqueue("srs@example.com", "alice@example.com", "code ABC123")
+        deadline = time.monotonic() + 5
+        while outbox.pending_count() and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        outbox.stop()
+    [path] = directory.iterdir()
+    assert path.read_text() == "code ABC123"
+
+
+class FakeSmtp:
+    connections = 0
+
+    def __init__(self, host, port, timeout=None):
+        FakeSmtp.connections += 1
+        self.sent = []
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def sendmail(self, sender, recipient, message):
+        self.sent.append(recipient)
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        pass
+
+
+def test_smtp_session_is_reused(monkeypatch):
+    monkeypatch.setattr(outbox_module.smtplib, "SMTP", FakeSmtp)
+    FakeSmtp.connections = 0
+    transport = SmtpTransport("localhost", 25, username="srs", password="secret")
+    for i in range(5):
+        transport.send("srs@example.com", f"user_{i}@example.com", "code")
+    assert FakeSmtp.connections == 1
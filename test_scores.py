@@ -0,0 +1,34 @@
+import duckdb
+import pytest
+
+from scores import ensure_scores, exercise_points, record_attempt
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    ensure_scores(con)
+    yield con
+    con.close()
+
+
+def test_only_first_solve_scores(con):
+    points = exercise_points("medium", "srs")
+    assert record_attempt(con, "alice", "ex1", False, points)["points"] == 0
+    assert record_attempt(con, "alice", "ex1", True, points) == {
+        "points": 20,
+        "attempts": 2,
+        "solved": 1,
+    }
+    assert record_attempt(con, "alice", "ex1", True, points) == {
+        "points": 20,
+        "attempts": 3,
+        "solved": 1,
+    }
+
+
+def test_random_solve_keeps_points_for_srs(con):
+    record_attempt(con, "alice", "ex1", True, exercise_points("medium", "random"))
+    score = record_attempt(con, "alice", "ex1", True, exercise_points("medium", "srs"))
+    # Déjà compté comme résolu, mais les points restent à gagner.
+    assert score == {"points": 20, "attempts": 2, "solved": 1}
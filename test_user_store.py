@@ -0,0 +1,254 @@
+import json
+import time
+
+import duckdb
+import pytest
+
+from drive import LocalDriveFile, MemoryDriveFile
+from user_store import DuckDBUserStore, JsonDriveUserStore
+
+ALICE = {"email": "alice@example.com", "password": "a"}
+BOB = {"email": "bob@example.com", "password": "b"}
+
+
+class CountingDrive(MemoryDriveFile):
+    """Faux Drive qui compte les appels et peut échouer sur commande."""
+
+    def __init__(self, content=b"", latency=0.0):
+        super().__init__(content, latency)
+        self.versions = 0
+        self.downloads = 0
+        self.failures = {"version": 0, "download": 0, "upload": 0}
+
+    def _maybe_fail(self, operation):
+        if self.failures[operation] > 0:
+            self.failures[operation] -= 1
+            raise OSError(f"{operation} indisponible")
+
+    def version(self):
+        self.versions += 1
+        self._maybe_fail("version")
+        return super().version()
+
+    def download(self):
+        self.downloads += 1
+        self._maybe_fail("download")
+        return super().download()
+
+    def upload(self, content, expected_version=None):
+        self._maybe_fail("upload")
+        return super().upload(content, expected_version)
+
+
+def make_store(drive, **options):
+    options = {"flush_delay": 0.05, "retry_delay": 0.01, **options}
+    return JsonDriveUserStore(drive, **options)
+
+
+def remote_users(drive):
+    return json.loads(drive.content)
+
+
+def test_reads_are_served_from_memory_until_ttl():
+    drive = CountingDrive.with_users({"alice": ALICE})
+    store = make_store(drive, ttl=0.1)
+
+    assert store.get("alice") == ALICE
+    assert store.get_by_email("alice@example.com") == ("alice", ALICE)
+    assert (drive.downloads, drive.versions) == (1, 0)
+
+    time.sleep(0.15)
+    assert store.get("alice") == ALICE
+    # Version inchangée : pas de nouveau téléchargement.
+    assert (drive.downloads, drive.versions) == (1, 1)
+
+
+def test_ttl_refresh_picks_up_remote_changes():
+    drive = CountingDrive.with_users({"alice": ALICE})
+    store = make_store(drive, ttl=0.1)
+    assert store.get("bob") is None
+
+    drive.upload(json.dumps({"alice": ALICE, "bob": BOB}).encode())
+    assert store.get("bob") is None
+    time.sleep(0.15)
+    assert store.get("bob") == BOB
+    assert drive.downloads == 2
+
+
+def test_warm_cache_survives_drive_errors():
+    drive = CountingDrive.with_users({"alice": ALICE})
+    store = make_store(drive, ttl=0.05)
+    assert store.get("alice") == ALICE
+
+    time.sleep(0.1)
+    drive.failures["version"] = 1
+    assert store.get("alice") == ALICE
+
+    time.sleep(0.1)
+    drive.upload(json.dumps({"alice": ALICE, "bob": BOB}).encode())
+    drive.failures["download"] = 1
+    assert store.get("bob") is None
+    # Drive de nouveau joignable au TTL suivant.
+    time.sleep(0.1)
+    assert store.get("bob") == BOB
+
+
+def test_cold_cache_raises_drive_errors():
+    drive = CountingDrive.with_users({"alice": ALICE})
+    drive.failures["download"] = 1
+    store = make_store(drive)
+    with pytest.raises(OSError):
+        store.get("alice")
+    assert store.get("alice") == ALICE
+
+
+def test_writes_are_batched():
+    drive = CountingDrive.with_users({})
+    store = make_store(drive, flush_delay=0.1)
+
+    for i in range(20):
+        store.add(f"user_{i}", {"email": f"user_{i}@example.com", "password": "x"})
+    store.put("user_0", {"email": "user_0@example.com", "password": "y"})
+    assert store.get("user_19") is not None
+
+    assert store.flush(timeout=5)
+    assert drive.uploads == 1
+    users = remote_users(drive)
+    assert len(users) == 20
+    assert users["user_0"]["password"] == "y"
+
+
+def test_failed_upload_is_retried():
+    drive = CountingDrive.with_users({})
+    drive.failures["upload"] = 2
+    store = make_store(drive)
+
+    store.add("alice", ALICE)
+    assert store.flush(timeout=5)
+    assert drive.uploads == 1
+    assert remote_users(drive) == {"alice": ALICE}
+
+
+def test_exhausted_retries_keep_pending_writes():
+    drive = CountingDrive.with_users({})
+    drive.failures["upload"] = 3
+    store = make_store(drive, max_retries=2)
+
+    store.add("alice", ALICE)
+    # Deux échecs par tour : le premier tour abandonne, le second envoie.
+    assert store.flush(timeout=5)
+    assert remote_users(drive) == {"alice": ALICE}
+
+
+def test_version_conflict_merges_remote_changes(tmp_path):
+    path = str(tmp_path / "users.json")
+    LocalDriveFile(path).upload(json.dumps({}).encode())
+    first = make_store(LocalDriveFile(path))
+    second = make_store(LocalDriveFile(path))
+    first.load()
+    second.load()
+
+    first.add("alice", ALICE)
+    assert first.flush(timeout=5)
+    # second a lu une version périmée : son envoi est refusé, puis fusionné.
+    second.add("bob", BOB)
+    assert second.flush(timeout=5)
+
+    with open(path) as f:
+        assert json.load(f) == {"alice": ALICE, "bob": BOB}
+    assert second.get("alice") == ALICE
+
+
+def test_version_conflict_keeps_local_deletions(tmp_path):
+    path = str(tmp_path / "users.json")
+    LocalDriveFile(path).upload(json.dumps({"alice": ALICE, "bob": BOB}).encode())
+    first = make_store(LocalDriveFile(path))
+    second = make_store(LocalDriveFile(path))
+    first.load()
+    second.load()
+
+    first.put("alice", {**ALICE, "password": "new"})
+    assert first.flush(timeout=5)
+    second.replace_all({"alice": ALICE})
+    assert second.flush(timeout=5)
+
+    with open(path) as f:
+        # bob supprimé par second ; alice : la dernière écriture l'emporte.
+        assert json.load(f) == {"alice": ALICE}
+
+
+def test_json_store_rejects_taken_email():
+    store = make_store(CountingDrive.with_users({"alice": ALICE}))
+
+    assert not store.add("mallory", {**ALICE, "password": "m"})
+    with pytest.raises(ValueError):
+        store.put("bob", {**BOB, "email": ALICE["email"]})
+    assert store.get_by_email(ALICE["email"]) == ("alice", ALICE)
+    assert store.get("bob") is None
+
+
+def test_duckdb_email_change(tmp_path):
+    store = DuckDBUserStore(str(tmp_path / "users.duckdb"))
+    store.add("alice", ALICE)
+    store.add("bob", BOB)
+
+    store.put("alice", {**ALICE, "email": "alice@new.com"})
+    assert store.get_by_email("alice@new.com") == (
+        "alice",
+        {**ALICE, "email": "alice@new.com"},
+    )
+    assert store.get_by_email("alice@example.com") == (None, None)
+
+
+def test_duckdb_conflicting_email_keeps_user(tmp_path):
+    store = DuckDBUserStore(str(tmp_path / "users.duckdb"))
+    store.add("alice", ALICE)
+    store.add("bob", BOB)
+
+    with pytest.raises(ValueError):
+        store.put("alice", {**ALICE, "email": BOB["email"]})
+    assert store.get("alice") == ALICE
+    assert not store.add("carol", {**BOB, "password": "c"})
+
+
+def test_duckdb_replace_all_is_atomic(tmp_path):
+    store = DuckDBUserStore(str(tmp_path / "users.duckdb"))
+    store.add("alice", ALICE)
+
+    with pytest.raises(ValueError):
+        store.replace_all({"bob": BOB, "carol": {**BOB, "password": "c"}})
+    assert store.all() == {"alice": ALICE}
+
+    store.replace_all({"alice": {**ALICE, "password": "new"}, "bob": BOB})
+    assert store.all() == {"alice": {**ALICE, "password": "new"}, "bob": BOB}
+
+
+def test_duckdb_replace_all_empty(tmp_path):
+    store = DuckDBUserStore(str(tmp_path / "users.duckdb"))
+    store.add("alice", ALICE)
+
+    store.replace_all({})
+    assert store.all() == {}
+
+
+def test_duckdb_migrates_constrained_table(tmp_path):
+    database = str(tmp_path / "users.duckdb")
+    con = duckdb.connect(database)
+    con.execute(
+        """
+        CREATE TABLE users (
+            username VARCHAR PRIMARY KEY,
+            email VARCHAR NOT NULL,
+            password VARCHAR NOT NULL,
+            reset_code VARCHAR
+        )
+        """
+    )
+    con.execute("CREATE UNIQUE INDEX users_email_idx ON users (email)")
+    con.execute("INSERT INTO users VALUES ('alice', 'alice@example.com', 'a', NULL)")
+    con.close()
+
+    store = DuckDBUserStore(database)
+    assert store.get("alice") == ALICE
+    store.put("alice", {**ALICE, "email": "alice@new.com"})
+    assert store.get("alice")["email"] == "alice@new.com"
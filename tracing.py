@@ -0,0 +1,141 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Nombre de mesures conservées par span : les percentiles portent sur les
+# dernières exécutions, avec une mémoire bornée.
+BUFFER_SIZE = 1024
+
+logger = logging.getLogger("sql_srs.tracing")
+
+_lock = threading.Lock()
+_durations = {}
+_counts = {}
+_errors = {}
+
+
+def configure_logging():
+    """SQL_SRS_TRACE_LOG=<fichier> (ou "-" pour stderr) : un span JSON par ligne."""
+    target = os.environ.get("SQL_SRS_TRACE_LOG")
+    if not target or logger.handlers:
+        return
+    handler = logging.StreamHandler() if target == "-" else logging.FileHandler(target)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def record(name, duration_ms, error=None, attributes=None):
+    with _lock:
+        buffer = _durations.get(name)
+        if buffer is None:
+            buffer = _durations[name] = deque(maxlen=BUFFER_SIZE)
+        buffer.append(duration_ms)
+        _counts[name] = _counts.get(name, 0) + 1
+        if error is not None:
+            _errors[name] = _errors.get(name, 0) + 1
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            json.dumps(
+                {
+                    "ts": time.time(),
+                    "span": name,
+                    "duration_ms": round(duration_ms, 3),
+                    "error": error,
+                    "thread": threading.current_thread().name,
+                    **(attributes or {}),
+                },
+                default=str,
+            )
+        )
+
+
+@contextmanager
+def span(name, **attributes):
+    """Mesure la durée du bloc ; les exceptions sont comptées puis relancées."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record(name, (time.perf_counter() - start) * 1000, error, attributes)
+
+
+def traced(name=None):
+    """Décorateur : chaque appel de la fonction devient un span."""
+
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def summary():
+    """Nombre d'appels, erreurs et percentiles (ms) de chaque span.
+
+    count compte tous les appels ; percentiles et max portent sur les
+    `samples` dernières mesures (au plus BUFFER_SIZE).
+    """
+    with _lock:
+        snapshot = {name: list(buffer) for name, buffer in _durations.items()}
+        counts = dict(_counts)
+        errors = dict(_errors)
+
+    rows = []
+    for name, durations in sorted(snapshot.items()):
+        p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+        rows.append(
+            {
+                "span": name,
+                "count": counts[name],
+                "samples": len(durations),
+                "errors": errors.get(name, 0),
+                "p50_ms": round(p50, 2),
+                "p95_ms": round(p95, 2),
+                "p99_ms": round(p99, 2),
+                "max_ms": round(max(durations), 2),
+            }
+        )
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "span",
+            "count",
+            "samples",
+            "errors",
+            "p50_ms",
+            "p95_ms",
+            "p99_ms",
+            "max_ms",
+        ],
+    )
+
+
+def reset():
+    with _lock:
+        _durations.clear()
+        _counts.clear()
+        _errors.clear()
+
+
+configure_logging()
@@ -0,0 +1,472 @@
+import copy
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import duckdb
+
+from drive import VersionConflict
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+USER_FIELDS = ("email", "password", "reset_code")
+USER_COLUMNS = "username, email, password, reset_code"
+CREATE_USERS = """
+    CREATE TABLE IF NOT EXISTS users (
+        username VARCHAR NOT NULL,
+        email VARCHAR NOT NULL,
+        password VARCHAR NOT NULL,
+        reset_code VARCHAR
+    )
+"""
+INSERT_USER = "INSERT INTO users VALUES (?, ?, ?, ?)"
+
+
+class UserStore:
+    """Interface commune des backends de stockage des utilisateurs.
+
+    Un utilisateur est un dict {"email", "password", ["reset_code"]} indexé
+    par son nom d'utilisateur.
+    """
+
+    def load(self, force=False):
+        pass
+
+    def flush(self, timeout=None):
+        return True
+
+    def all(self):
+        raise NotImplementedError
+
+    def get(self, username):
+        raise NotImplementedError
+
+    def get_by_email(self, email):
+        """Renvoie (username, user) ou (None, None)."""
+        raise NotImplementedError
+
+    def add(self, username, data):
+        raise NotImplementedError
+
+    def put(self, username, data):
+        raise NotImplementedError
+
+    def replace_all(self, users):
+        raise NotImplementedError
+
+
+class JsonDriveUserStore(UserStore):
+    """Cache mémoire des utilisateurs, synchronisé avec un fichier Drive.
+
+    Les lectures sont servies depuis la mémoire ; le fichier distant n'est
+    revérifié (via sa version) qu'après expiration du TTL. Les écritures
+    sont appliquées en mémoire puis envoyées par un thread d'arrière-plan
+    qui regroupe les modifications rapprochées et réessaie en cas d'échec.
+
+    L'envoi est conditionné à la version lue : si un autre processus a écrit
+    entre-temps, sa version est rechargée et les utilisateurs modifiés
+    localement y sont réappliqués avant un nouvel essai. Deux écritures sur
+    des utilisateurs différents ne se perdent donc plus ; sur un même
+    utilisateur, la dernière l'emporte.
+    """
+
+    def __init__(
+        self,
+        drive,
+        ttl=60.0,
+        flush_delay=1.0,
+        max_retries=5,
+        retry_delay=1.0,
+        mirror_path=None,
+    ):
+        self.drive = drive
+        self.ttl = ttl
+        self.flush_delay = flush_delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.mirror_path = mirror_path
+
+        self._users = None
+        # Modifications pas encore envoyées : nom -> données (None = suppression).
+        self._pending = {}
+        self._emails = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._dirty = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._writer = None
+
+    # -------------------------------------------------------------------------------
+    # LECTURE
+    # -------------------------------------------------------------------------------
+    def _refresh(self, force=False):
+        with self._lock:
+            if not self._idle.is_set():
+                # Des écritures sont en attente : la copie locale fait foi.
+                return
+            now = time.monotonic()
+            if (
+                not force
+                and self._users is not None
+                and now - self._checked_at < self.ttl
+            ):
+                return
+            try:
+                if not force and self._users is not None:
+                    with span("drive.version"):
+                        remote_version = self.drive.version()
+                    if remote_version == self._version:
+                        self._checked_at = now
+                        return
+
+                with span("drive.download"):
+                    content, version = self.drive.download()
+            except Exception as e:
+                if force or self._users is None:
+                    raise
+                # Drive injoignable : la copie en mémoire reste servie, nouvel
+                # essai au prochain TTL.
+                logger.warning(
+                    "Drive injoignable, cache des utilisateurs servi : %s", e
+                )
+                self._checked_at = now
+                return
+            self._users = json.loads(content) if content else {}
+            self._reindex()
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._write_mirror()
+
+    def _reindex(self):
+        self._emails = {
+            user.get("email"): username for username, user in self._users.items()
+        }
+
+    def _write_mirror(self):
+        if self.mirror_path is None:
+            return
+        directory = os.path.dirname(self.mirror_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.mirror_path, "w") as f:
+            json.dump(self._users, f, indent=4)
+
+    def load(self, force=False):
+        self._refresh(force=force)
+
+    def get_by_email(self, email):
+        with self._lock:
+            self._refresh()
+            username = self._emails.get(email)
+            if username is None or username not in self._users:
+                return None, None
+            return username, copy.deepcopy(self._users[username])
+
+    def all(self):
+        with self._lock:
+            self._refresh()
+            return copy.deepcopy(self._users)
+
+    def get(self, username):
+        with self._lock:
+            self._refresh()
+            user = self._users.get(username)
+            return copy.deepcopy(user) if user is not None else None
+
+    # -------------------------------------------------------------------------------
+    # ÉCRITURE
+    # -------------------------------------------------------------------------------
+    def _email_owner(self, email):
+        username = self._emails.get(email)
+        return username if username in self._users else None
+
+    def put(self, username, data):
+        with self._lock:
+            self._refresh()
+            owner = self._email_owner(data.get("email"))
+            if owner is not None and owner != username:
+                raise ValueError(f"Email déjà utilisé : {data.get('email')}")
+            previous = self._users.get(username)
+            if previous is not None:
+                self._emails.pop(previous.get("email"), None)
+            self._users[username] = copy.deepcopy(data)
+            self._emails[data.get("email")] = username
+            self._pending[username] = copy.deepcopy(data)
+            self._schedule_flush()
+
+    def add(self, username, data):
+        with self._lock:
+            self._refresh()
+            if username in self._users or self._email_owner(data.get("email")):
+                return False
+            self._users[username] = copy.deepcopy(data)
+            self._emails[data.get("email")] = username
+            self._pending[username] = copy.deepcopy(data)
+            self._schedule_flush()
+            return True
+
+    def replace_all(self, users):
+        with self._lock:
+            for username in self._users or {}:
+                if username not in users:
+                    self._pending[username] = None
+            self._pending.update(copy.deepcopy(users))
+            self._users = copy.deepcopy(users)
+            self._reindex()
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        self._write_mirror()
+        self._idle.clear()
+        self._dirty.set()
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(
+                target=self._write_loop, name="user-store-writer", daemon=True
+            )
+            self._writer.start()
+
+    def flush(self, timeout=None):
+        """Attend que toutes les écritures en attente soient envoyées."""
+        return self._idle.wait(timeout)
+
+    def _write_loop(self):
+        while True:
+            self._dirty.wait()
+            # Regroupe les écritures rapprochées en un seul envoi.
+            time.sleep(self.flush_delay)
+            with self._lock:
+                self._dirty.clear()
+                pending, self._pending = self._pending, {}
+
+            version = self._upload_with_retry(pending)
+
+            with self._lock:
+                if version is None:
+                    # Rien n'est perdu : le contenu sera renvoyé au prochain tour.
+                    self._pending = {**pending, **self._pending}
+                    self._dirty.set()
+                else:
+                    self._version = version
+                    self._checked_at = time.monotonic()
+                if not self._dirty.is_set():
+                    self._idle.set()
+
+    def _merge_remote(self, pending):
+        """Recharge le fichier distant et y réapplique les modifications locales."""
+        with span("drive.download"):
+            content, version = self.drive.download()
+        users = json.loads(content) if content else {}
+        with self._lock:
+            for username, data in {**pending, **self._pending}.items():
+                if data is None:
+                    users.pop(username, None)
+                else:
+                    users[username] = copy.deepcopy(data)
+            self._users = users
+            self._reindex()
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._write_mirror()
+
+    def _upload_with_retry(self, pending):
+        delay = self.retry_delay
+        for attempt in range(1, self.max_retries + 1):
+            with self._lock:
+                content = json.dumps(self._users, indent=4).encode()
+                expected_version = self._version
+            try:
+                with span("drive.upload", bytes=len(content)):
+                    return self.drive.upload(content, expected_version)
+            except VersionConflict:
+                # Un autre processus a écrit : fusion, puis nouvel essai immédiat.
+                try:
+                    with span("drive.merge"):
+                        self._merge_remote(pending)
+                    continue
+                except Exception as e:
+                    error = e
+            except Exception as e:
+                error = e
+            logger.error(
+                "Échec de la sauvegarde des utilisateurs (tentative %s/%s) : %s",
+                attempt,
+                self.max_retries,
+                error,
+            )
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay *= 2
+        return None
+
+
+class DuckDBUserStore(UserStore):
+    """Utilisateurs stockés dans une table DuckDB indexée.
+
+    Les recherches par nom d'utilisateur ou par email passent par un index et
+    ne lisent qu'une ligne ; les mises à jour ne touchent qu'une ligne.
+
+    Pas de contrainte d'unicité : DuckDB refuse de modifier une colonne
+    couverte par un index unique, ou de réinsérer une clé supprimée dans la
+    même transaction, ce qui empêche tout changement d'email atomique.
+    L'unicité du nom et de l'email est vérifiée ici, sous un verrou (la base
+    n'a qu'un processus écrivain).
+    """
+
+    def __init__(self, database="data/users.duckdb"):
+        directory = os.path.dirname(database)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.con = duckdb.connect(database=database, read_only=False)
+        self._lock = threading.Lock()
+        self._migrate_constraints()
+        self.con.execute(CREATE_USERS)
+        self.con.execute(
+            "CREATE INDEX IF NOT EXISTS users_username_idx ON users (username)"
+        )
+        self.con.execute("CREATE INDEX IF NOT EXISTS users_email_idx ON users (email)")
+
+    def _migrate_constraints(self):
+        """Retire la clé primaire et l'index unique des anciennes tables users."""
+        constrained = self.con.execute(
+            """
+            SELECT count(*) FROM duckdb_constraints()
+            WHERE table_name = 'users' AND constraint_type IN ('PRIMARY KEY', 'UNIQUE')
+            """
+        ).fetchone()[0]
+        if not constrained:
+            return
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            self.con.execute("CREATE TABLE users_old AS SELECT * FROM users")
+            self.con.execute("DROP TABLE users")
+            self.con.execute(CREATE_USERS)
+            self.con.execute(f"INSERT INTO users SELECT {USER_COLUMNS} FROM users_old")
+            self.con.execute("DROP TABLE users_old")
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _to_user(row):
+        email, password, reset_code = row
+        user = {"password": password, "email": email}
+        if reset_code is not None:
+            user["reset_code"] = reset_code
+        return user
+
+    @staticmethod
+    def _to_row(username, user):
+        return [username, user["email"], user["password"], user.get("reset_code")]
+
+    def all(self):
+        rows = self.con.cursor().execute(f"SELECT {USER_COLUMNS} FROM users").fetchall()
+        return {row[0]: self._to_user(row[1:]) for row in rows}
+
+    def get(self, username):
+        row = (
+            self.con.cursor()
+            .execute(
+                "SELECT email, password, reset_code FROM users WHERE username = ?",
+                [username],
+            )
+            .fetchone()
+        )
+        return self._to_user(row) if row is not None else None
+
+    def get_by_email(self, email):
+        row = (
+            self.con.cursor()
+            .execute(f"SELECT {USER_COLUMNS} FROM users WHERE email = ?", [email])
+            .fetchone()
+        )
+        if row is None:
+            return None, None
+        return row[0], self._to_user(row[1:])
+
+    def add(self, username, data):
+        with self._lock:
+            if self.get(username) is not None or self.get_by_email(data["email"])[0]:
+                return False
+            self.con.cursor().execute(INSERT_USER, self._to_row(username, data))
+        return True
+
+    def put(self, username, data):
+        with self._lock:
+            owner, _ = self.get_by_email(data["email"])
+            if owner is not None and owner != username:
+                raise ValueError(f"Email déjà utilisé : {data['email']}")
+            cursor = self.con.cursor()
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                updated = cursor.execute(
+                    """
+                    UPDATE users SET email = ?, password = ?, reset_code = ?
+                    WHERE username = ?
+                    """,
+                    self._to_row(username, data)[1:] + [username],
+                ).fetchone()[0]
+                if not updated:
+                    cursor.execute(INSERT_USER, self._to_row(username, data))
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def replace_all(self, users):
+        emails = Counter(user["email"] for user in users.values())
+        duplicates = sorted(email for email, count in emails.items() if count > 1)
+        if duplicates:
+            raise ValueError(f"Emails en double : {', '.join(duplicates)}")
+        with self._lock:
+            cursor = self.con.cursor()
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                cursor.execute("DELETE FROM users")
+                rows = [
+                    self._to_row(username, user) for username, user in users.items()
+                ]
+                # executemany refuse une liste vide.
+                if rows:
+                    cursor.executemany(INSERT_USER, rows)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+
+def migrate_json_to_db(json_path, store):
+    """Copie unique de users.json vers un DuckDBUserStore vide."""
+    if store.all():
+        logger.info("La table users contient déjà des données, migration ignorée.")
+        return 0
+
+    with open(json_path, "r") as f:
+        users = json.load(f)
+
+    migrated = 0
+    for username, user in users.items():
+        if store.add(username, user):
+            migrated += 1
+        else:
+            logger.error(
+                "Utilisateur %s ignoré : email déjà utilisé (%s).",
+                username,
+                user.get("email"),
+            )
+    return migrated
+
+
+if __name__ == "__main__":
+    # python user_store.py json/users.json data/users.duckdb
+    source = sys.argv[1] if len(sys.argv) > 1 else "json/users.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else "data/users.duckdb"
+    count = migrate_json_to_db(source, DuckDBUserStore(target))
+    print(f"{count} utilisateur(s) migré(s) vers {target}.")
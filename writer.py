@@ -0,0 +1,98 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    """Écrivain unique : toutes les modifications de la base passent par lui.
+
+    Les opérations sont des fonctions `func(con, *args)` exécutées par un
+    seul thread, sur un curseur dédié. Les opérations arrivées ensemble sont
+    regroupées dans une même transaction (un seul COMMIT par lot). Si le lot
+    échoue, il est annulé puis rejoué opération par opération, pour que
+    seule l'opération fautive renvoie une erreur.
+
+    Les lectures restent sur les curseurs des sessions : DuckDB leur donne
+    un instantané cohérent pendant que l'écrivain travaille.
+    """
+
+    def __init__(self, con, max_batch=64):
+        self.max_batch = max_batch
+        self._cursor = con.cursor()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(
+            target=self._run, name="database-writer", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def execute(self, func, *args, **kwargs):
+        return self.submit(func, *args, **kwargs).result()
+
+    def stop(self, timeout=None):
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch and batch[-1] is not None:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stopping = batch[-1] is None
+            batch = [operation for operation in batch if operation is not None]
+            if batch:
+                self._apply(batch)
+            if stopping:
+                return
+
+    def _transaction(self, operations):
+        self._cursor.execute("BEGIN TRANSACTION")
+        try:
+            results = [
+                func(self._cursor, *args, **kwargs)
+                for _, func, args, kwargs in operations
+            ]
+            self._cursor.execute("COMMIT")
+        except BaseException:
+            self._cursor.execute("ROLLBACK")
+            raise
+        return results
+
+    def _apply(self, batch):
+        operations = [op for op in batch if op[0].set_running_or_notify_cancel()]
+        if not operations:
+            return
+        try:
+            with span("writer.batch", size=len(operations)):
+                results = self._transaction(operations)
+        except Exception as e:
+            if len(operations) == 1:
+                operations[0][0].set_exception(e)
+                return
+            logger.warning(f"Lot d'écriture annulé, rejeu un par un : {e}")
+            for operation in operations:
+                try:
+                    (result,) = self._transaction([operation])
+                except Exception as error:
+                    operation[0].set_exception(error)
+                else:
+                    operation[0].set_result(result)
+            return
+        for (future, *_), result in zip(operations, results):
+            future.set_result(result)